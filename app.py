@@ -22,13 +22,20 @@ from retriever_catalog import answer as catalog_answer
 # Helpers: councils
 # =========================
 
+# Streamlit re-runs this script on every interaction; the parse is cached per (mtime, size) of the file,
+# so a rerun costs one stat and an edited councils.json is still picked up.
+@st.cache_data(show_spinner=False)
+def _council_names(path: str, mtime_ns: int, size: int) -> list[str]:
+    with open(path, "r") as f:
+        data = json.load(f)
+        # Expect keys as display names; preserve JSON order
+        return list(data.keys())
+
 def load_councils() -> list[str]:
     """Load council names for the dropdown from councils.json; fallback if missing."""
     try:
-        with open("councils.json", "r") as f:
-            data = json.load(f)
-            # Expect keys as display names; preserve JSON order
-            return list(data.keys())
+        stat = os.stat("councils.json")
+        return _council_names("councils.json", stat.st_mtime_ns, stat.st_size)
     except Exception:
         return [
             "Wyndham City Council",
@@ -60,6 +67,7 @@ DISPLAY_TO_SLUG = {
 }
 
 _SLUG_STRIP = re.compile(r"\b(city of|city|shire|council|borough)\b", re.I)
+_SLUG_NON_ALNUM = re.compile(r"[^a-z0-9]+")
 
 def council_to_slug(name: str) -> str:
     """Map display names to a short slug; default is a simple slugify of the display name.
@@ -69,7 +77,7 @@ def council_to_slug(name: str) -> str:
         return DISPLAY_TO_SLUG[name]
     s = name.lower().strip()
     s = _SLUG_STRIP.sub("", s)
-    s = re.sub(r"[^a-z0-9]+", "-", s).strip("-")
+    s = _SLUG_NON_ALNUM.sub("-", s).strip("-")
     # Many retrievers expect bare council root (e.g., "wyndham"); if the slug contains dashes,
     # keep it but your retriever may not have data for it yet.
     return s
@@ -6,7 +6,7 @@ from urllib.parse import urljoin
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
-from bs4 import BeautifulSoup
+from selectolax.parser import HTMLParser
 
 # ---------- Tuning ----------
 TIMEOUT = int(os.getenv("CATALOG_TIMEOUT", "18"))
@@ -219,11 +219,12 @@ def fetch(url: str):
         r = SESSION.get(url, timeout=TIMEOUT, allow_redirects=True)
         if r.status_code != 200 or not r.text or not r.text.strip():
             return None, None
-        soup = BeautifulSoup(r.text, "html.parser")
-        for t in soup(["script","style","noscript","svg"]): 
+        tree = HTMLParser(r.text)
+        for t in tree.css("script,style,noscript,svg"):
             t.decompose()
-        title = (soup.title.string.strip() if soup.title and soup.title.string else url)
-        text = re.sub(r"\s+", " ", soup.get_text(" ").strip())
+        title_node = tree.css_first("title")
+        title = (title_node.text().strip() if title_node and title_node.text().strip() else url)
+        text = re.sub(r"\s+", " ", (tree.root.text(separator=" ") if tree.root else "").strip())
         return title, text[:20000]
     except Exception:
         return None, None
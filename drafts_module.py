@@ -15,6 +15,7 @@ from __future__ import annotations
 import os
 import re
 import json
+import functools
 import html as _html
 from typing import Callable, Dict, List, Optional, Tuple, Union
 
@@ -199,6 +200,11 @@ def classify_risk(text: str) -> Tuple[str, List[str]]:
         reasons.append("No risk triggers detected")
     return risk, reasons
 
+# Escaped <li> per (url, title): fallback links repeat across drafts, so escape each pair once
+@functools.lru_cache(maxsize=1024)
+def _link_li(url: str, title: str) -> str:
+    return f"<li><a href=\"{_html.escape(url)}\">{_html.escape(title)}</a></li>"
+
 def _default_reply(council_name: str, links: Optional[List[Dict[str,str]]] = None) -> str:
     intro = f"<p>Thanks for contacting {_html.escape(council_name)}.</p>"
     body = (
@@ -207,10 +213,15 @@ def _default_reply(council_name: str, links: Optional[List[Dict[str,str]]] = Non
         "please see the links below.</p>"
     )
     links = links or [{"title": f"{council_name} services", "url": f"https://www.{council_name.lower().split()[0]}.vic.gov.au/services"}]
-    items = "".join(f"<li><a href=\"{_html.escape(l['url'])}\">{_html.escape(l['title'])}</a></li>" for l in links if l.get("url"))
+    items = "".join(_link_li(l["url"], l["title"]) for l in links if l.get("url"))
     footer = "<p><em>Auto-drafted reply. Please review before sending.</em></p>"
     return f"{intro}{body}<ul>{items}</ul>{footer}"
 
+# The no-links fallback only depends on the council name (a handful in practice), so build it once each
+@functools.lru_cache(maxsize=64)
+def _fallback_reply(council_name: str) -> str:
+    return _default_reply(council_name)
+
 # Accept multiple return shapes from get_answer_fn
 GetAnswerReturn = Union[Tuple[str, List[str]], Dict[str, object], str]
 
@@ -252,7 +263,7 @@ def build_cited_reply(
                     elif isinstance(l, str):
                         citations.append(l)
                 if not html_body:
-                    html_body = _default_reply(council_name)
+                    html_body = _fallback_reply(council_name)
                 if "Auto-drafted reply" not in html_body:
                     html_body += "<p><em>Auto-drafted reply. Please review before sending.</em></p>"
                 return html_body, citations
@@ -265,12 +276,12 @@ def build_cited_reply(
                 return html_body, []
 
         # Fallback if get_answer_fn missing or failed shapes
-        html_body = _default_reply(council_name)
+        html_body = _fallback_reply(council_name)
         return html_body, [f"{council_name} services | https://www.{council_name.lower().split()[0]}.vic.gov.au/services"]
 
     except Exception as e:
         st.warning(f"Reply generation failed; using fallback. Error: {e}")
-        html_body = _default_reply(council_name)
+        html_body = _fallback_reply(council_name)
         return html_body, []
 
 
@@ -5,21 +5,38 @@
 # Examples:
 #   python3 ingest.py --only "Wyndham City Council" --limit-pages 40 --max-chunks 600 --batch 12
 #   python3 ingest.py  # build all councils from councils.json with safe defaults
+#   python3 ingest.py --refresh  # clear the on-disk HTTP cache first
+#   python3 ingest.py --workers 4  # build four councils at a time
 
-import os, sys, json, re, time, gzip, argparse, hashlib, gzip
+import os, sys, json, re, time, gzip, argparse, hashlib, io, sqlite3, multiprocessing, threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Optional
 from urllib.parse import urlparse, urljoin
-from xml.etree import ElementTree as ET
 
 import requests
+import requests_cache
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
-from bs4 import BeautifulSoup
+from selectolax.parser import HTMLParser
+from lxml import etree
 import faiss, numpy as np, tiktoken
-from openai import OpenAI
+import orjson
+from openai import OpenAI, RateLimitError
 import urllib.robotparser as robotparser
 
 EMBED_MODEL = os.getenv("EMBED_MODEL", "text-embedding-3-small")  # 1536 dims
-DIM = 1536
+# text-embedding-3 models can return shortened (Matryoshka) vectors, e.g. EMBED_DIMENSIONS=512;
+# queries against the index must then request the same size.
+DIM = int(os.getenv("EMBED_DIMENSIONS", "1536"))
+_DIM_KW = {} if DIM == 1536 else {"dimensions": DIM}
+EMBED_MAX_TOKENS = 8191  # per-input limit of the embeddings endpoint
+EMBED_MAX_ITEMS = 2048  # per-request input count limit
+EMBED_BATCH_TOKENS = int(os.getenv("EMBED_BATCH_TOKENS", "200000"))  # stay under the per-request token cap
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "4"))  # concurrent embedding requests (across all --workers processes)
+HNSW_M = int(os.getenv("INDEX_HNSW_M", "32"))  # graph degree; higher = better recall, more RAM
+HNSW_EF_CONSTRUCTION = int(os.getenv("INDEX_HNSW_EF_CONSTRUCTION", "200"))
+HNSW_EF_SEARCH = int(os.getenv("INDEX_HNSW_EF_SEARCH", "64"))  # saved with the index; query-time beam width
 ENC = tiktoken.get_encoding("cl100k_base")
 
 OUT_ROOT = os.getenv("INDEX_ROOT", "index")  # will write to index/<slug>/
@@ -29,7 +46,14 @@ os.makedirs(OUT_ROOT, exist_ok=True)
 TIMEOUT = int(os.getenv("INGEST_TIMEOUT", "25"))
 RETRY_TOTAL = int(os.getenv("INGEST_RETRIES", "4"))
 RETRY_BACKOFF = float(os.getenv("INGEST_BACKOFF", "0.6"))
-RATE_LIMIT = float(os.getenv("INGEST_RATE_LIMIT", "0.25"))  # seconds between requests
+RATE_LIMIT = float(os.getenv("INGEST_RATE_LIMIT", "0.25"))  # seconds between requests to one host (all threads)
+PROBE_WORKERS = int(os.getenv("INGEST_PROBE_WORKERS", "8"))  # concurrent HEADs / sitemap fetches
+FETCH_WORKERS = int(os.getenv("INGEST_FETCH_WORKERS", "16"))  # concurrent page fetches per council
+MAX_INFLIGHT = int(os.getenv("INGEST_MAX_INFLIGHT", "32"))  # cap on open requests across all threads
+
+# HTTP cache (ETag/Last-Modified revalidation) so re-ingests only transfer changed pages
+HTTP_CACHE_PATH = os.getenv("INGEST_HTTP_CACHE", os.path.join(OUT_ROOT, ".http_cache"))
+HTTP_CACHE_TTL = int(os.getenv("INGEST_HTTP_CACHE_TTL", str(24 * 3600)))  # seconds
 
 HEADERS = {
     "User-Agent": (
@@ -54,6 +78,10 @@ SKIP_PATTERNS = [
     "/terms", "/privacy-policy"  # legal pages are rarely useful for resident queries (except privacy) — adjust if needed
 ]
 
+# One compiled alternation per list instead of a substring scan per pattern
+KEEP_RE = re.compile("|".join(re.escape(p) for p in KEEP_PATTERNS))
+SKIP_RE = re.compile("|".join(re.escape(p) for p in SKIP_PATTERNS))
+
 FALLBACK_PATHS = [
     "/services","/contact-us","/contact","/rates","/rates-and-valuation",
     "/waste-recycling","/waste-and-recycling","/parking-permits","/parking/permits",
@@ -82,13 +110,21 @@ def slugify(name: str) -> str:
 
 def good(url: str) -> bool:
     u = url.lower()
-    if any(x in u for x in SKIP_PATTERNS):
+    if SKIP_RE.search(u):
         return False
-    return any(p in u for p in KEEP_PATTERNS)
+    return KEEP_RE.search(u) is not None
 
 # Session with retries
 def make_session() -> requests.Session:
-    s = requests.Session()
+    s = requests_cache.CachedSession(
+        HTTP_CACHE_PATH,
+        backend="sqlite",
+        expire_after=HTTP_CACHE_TTL,
+        cache_control=True,
+        allowable_methods=("GET", "HEAD"),
+        stale_if_error=True,
+        wal=True,  # --workers processes share this file; WAL lets their writes not lock out each other's reads
+    )
     s.headers.update(HEADERS)
     retry = Retry(
         total=RETRY_TOTAL,
@@ -97,18 +133,63 @@ def make_session() -> requests.Session:
         allowed_methods=frozenset(["GET", "HEAD"]),
         raise_on_status=False,
     )
-    adapter = HTTPAdapter(max_retries=retry, pool_connections=16, pool_maxsize=32)
+    adapter = HTTPAdapter(max_retries=retry, pool_connections=16, pool_maxsize=MAX_INFLIGHT)
     s.mount("https://", adapter)
     s.mount("http://", adapter)
     return s
 
 SESSION = make_session()
+# Bounds concurrent requests so nested sitemap/page pools never exceed the connection pool
+_INFLIGHT = threading.BoundedSemaphore(MAX_INFLIGHT)
+
+# Per-host pacer shared by every fetch/probe thread: each network request to a host reserves the next
+# slot RATE_LIMIT after the previous one, so the thread pools never multiply the request rate
+_PACE_LOCK = threading.Lock()
+_PACE_NEXT: dict = {}  # host -> time.monotonic() at which its next request may start
+
+def _pace(url: str) -> None:
+    if RATE_LIMIT <= 0:
+        return
+    host = urlparse(url).netloc
+    with _PACE_LOCK:
+        now = time.monotonic()
+        at = max(now, _PACE_NEXT.get(host, 0.0))
+        _PACE_NEXT[host] = at + RATE_LIMIT
+    if at > now:
+        time.sleep(at - now)
+
+def _request(method: str, url: str) -> requests.Response:
+    # Fresh cache hits never touch the network, so they skip the pacer. only_if_cached answers 504 for a
+    # miss, but with stale_if_error it hands back an expired entry instead: that one must be revalidated.
+    r = SESSION.request(method, url, timeout=TIMEOUT, allow_redirects=True, only_if_cached=True)
+    if r.status_code != 504 and not getattr(r, "is_expired", False):
+        return r
+    _pace(url)
+    with _INFLIGHT:
+        return SESSION.request(method, url, timeout=TIMEOUT, allow_redirects=True)
 
 def fetch(url: str) -> requests.Response:
-    r = SESSION.get(url, timeout=TIMEOUT, allow_redirects=True)
-    if RATE_LIMIT > 0:
-        time.sleep(RATE_LIMIT)
-    return r
+    return _request("GET", url)
+
+def probe(url: str):
+    """HEAD a URL (GET if the server rejects HEAD); None on network errors."""
+    try:
+        r = _request("HEAD", url)
+        if r.status_code == 405:
+            r = fetch(url)
+        return r
+    except Exception:
+        return None
+
+def body_text(r: requests.Response) -> str:
+    """Decode a response body without requests' charset sniffing (r.text runs charset_normalizer
+    over the whole page when the header has no charset). Falls back to UTF-8."""
+    ctype = (r.headers.get("Content-Type") or "").lower()
+    enc = r.encoding if "charset=" in ctype else None
+    try:
+        return r.content.decode(enc or "utf-8", errors="replace")
+    except LookupError:
+        return r.content.decode("utf-8", errors="replace")
 
 def sitemap_candidates(base: str):
     base = base.rstrip("/")
@@ -133,26 +214,44 @@ def sitemap_candidates(base: str):
         except Exception:
             pass
 
-def iter_sitemap_urls(sm_url: str):
+def iter_sitemap_urls(sm_url: str, host: str = "", limit: Optional[int] = None):
+    """Yield page URLs from a sitemap (recursing into sitemap indexes). Only URLs on `host` that
+    pass good() are yielded, and parsing stops as soon as `limit` have been found."""
+    count = 0
     try:
         r = fetch(sm_url)
         if r.status_code != 200 or not r.content:
             return
-        data = r.content
-        if sm_url.endswith(".gz") or r.headers.get("Content-Encoding","").lower() == "gzip":
-            try:
-                data = gzip.decompress(data)
-            except Exception:
-                pass
-        root = ET.fromstring(data)
-        if root.tag.endswith("sitemapindex"):
-            for node in root.iter():
-                if node.tag.endswith("loc") and node.text:
-                    yield from iter_sitemap_urls(node.text.strip())
-        else:
-            for node in root.iter():
-                if node.tag.endswith("loc") and node.text:
-                    yield node.text.strip()
+        # .xml.gz files arrive still compressed (Content-Encoding: gzip is already undone by
+        # requests); sniff the gzip magic and decompress as a stream into the parser.
+        stream = io.BytesIO(r.content)
+        if r.content[:2] == b"\x1f\x8b":
+            stream = gzip.GzipFile(fileobj=stream)
+        # Stream <loc> elements instead of building the whole tree; a <loc> under
+        # <sitemap> points at a child sitemap, one under <url> is a page.
+        for _, elem in etree.iterparse(stream, events=("end",), tag="{*}loc",
+                                       resolve_entities=False, no_network=True):
+            parent = elem.getparent()
+            is_index = parent is not None and etree.QName(parent).localname == "sitemap"
+            loc = (elem.text or "").strip()
+            # drop already-processed siblings so memory stays flat
+            elem.clear()
+            if parent is not None:
+                while parent.getprevious() is not None:
+                    del parent.getparent()[0]
+            if not loc:
+                continue
+            if is_index:
+                for u in iter_sitemap_urls(loc, host, None if limit is None else limit - count):
+                    yield u
+                    count += 1
+                    if limit is not None and count >= limit:
+                        return
+            elif (not host or urlparse(loc).netloc.endswith(host)) and good(loc):
+                yield loc
+                count += 1
+                if limit is not None and count >= limit:
+                    return
     except Exception:
         return
 
@@ -179,28 +278,28 @@ def load_robots(base: str) -> robotparser.RobotFileParser:
 
 def bfs_crawl(base: str, starts: list, limit_pages=120, max_depth=2, rp=None):
     host = urlparse(base).netloc
-    q, seen, urls = [], set(), []
+    q, seen, urls = deque(), set(), []
     for s in starts:
         absu = s if s.startswith("http") else urljoin(base, s)
         q.append((absu, 0)); seen.add(absu)
     while q and len(urls) < limit_pages:
-        url, depth = q.pop(0)
+        url, depth = q.popleft()
         if rp and not allow_url(rp, url):
             continue
         try:
             r = fetch(url)
             ctype = (r.headers.get("Content-Type") or "").lower()
-            if r.status_code != 200 or "text/html" not in ctype or not r.text:
+            if r.status_code != 200 or "text/html" not in ctype or not r.content:
                 continue
-            soup = BeautifulSoup(r.text, "html.parser")
+            tree = HTMLParser(body_text(r))
         except Exception:
             continue
         if good(url):
             urls.append(url)
         if depth >= max_depth:
             continue
-        for a in soup.select("a[href]"):
-            href = urljoin(url, a.get("href"))
+        for a in tree.css("a[href]"):
+            href = urljoin(url, a.attributes.get("href") or "")
             p = urlparse(href)
             if not p.scheme.startswith("http"): continue
             if not p.netloc.endswith(host): continue
@@ -209,25 +308,32 @@ def bfs_crawl(base: str, starts: list, limit_pages=120, max_depth=2, rp=None):
             seen.add(href); q.append((href, depth+1))
             if len(urls) >= limit_pages: break
     # dedupe preserving order
-    out, seen2 = [], set()
-    for u in urls:
-        if u not in seen2:
-            seen2.add(u); out.append(u)
-    return out
+    return list(dict.fromkeys(urls))
 
 def discover_urls(base: str, limit=150, ignore_robots=False) -> list:
     urls, seen = [], set()
     rp = None if ignore_robots else load_robots(base)
 
-    # sitemaps
-    for cand in sitemap_candidates(base):
-        for u in iter_sitemap_urls(cand) or []:
-            if urlparse(u).netloc.endswith(urlparse(base).netloc) and u not in seen:
-                if rp and not allow_url(rp, u):
-                    continue
-                seen.add(u); urls.append(u)
-                if len(urls) >= limit: break
-        if len(urls) >= limit: break
+    # sitemaps: up to PROBE_WORKERS candidates are fetched ahead, but results are taken in candidate
+    # order and nothing past the candidate that reaches `limit` is requested
+    host = urlparse(base).netloc
+    cands = sitemap_candidates(base)
+    parse = lambda c: list(iter_sitemap_urls(c, host, limit))
+    with ThreadPoolExecutor(max_workers=PROBE_WORKERS) as ex:
+        pending = deque(ex.submit(parse, c) for _, c in zip(range(PROBE_WORKERS), cands))
+        while pending and len(urls) < limit:
+            sm_urls = pending.popleft().result()
+            nxt = next(cands, None)
+            if nxt is not None:
+                pending.append(ex.submit(parse, nxt))
+            for u in sm_urls:
+                if u not in seen:
+                    if rp and not allow_url(rp, u):
+                        continue
+                    seen.add(u); urls.append(u)
+                    if len(urls) >= limit: break
+        for fut in pending:
+            fut.cancel()
 
     # seeds
     seed_paths = MANUAL_SEEDS.get(base.rstrip("/"), [])
@@ -235,20 +341,18 @@ def discover_urls(base: str, limit=150, ignore_robots=False) -> list:
         absu = s if s.startswith("http") else urljoin(base, s)
         if rp and not allow_url(rp, absu):
             continue
-        if absu not in urls: urls.append(absu)
+        if absu not in seen:
+            seen.add(absu); urls.append(absu)
 
-    # generic fallbacks
+    # generic fallbacks (probed concurrently with HEAD)
     if len(urls) < 10:
-        for path in FALLBACK_PATHS:
-            u = urljoin(base, path)
-            try:
-                if rp and not allow_url(rp, u): 
-                    continue
-                rr = fetch(u)
-                if rr.status_code == 200 and "text/html" in (rr.headers.get("Content-Type","").lower()):
+        cands = [urljoin(base, path) for path in FALLBACK_PATHS]
+        if rp:
+            cands = [u for u in cands if allow_url(rp, u)]
+        with ThreadPoolExecutor(max_workers=PROBE_WORKERS) as ex:
+            for u, rr in zip(cands, ex.map(probe, cands)):
+                if rr is not None and rr.status_code < 400 and "text/html" in (rr.headers.get("Content-Type","").lower()):
                     urls.append(u)
-            except Exception:
-                pass
 
     # mini-BFS if still thin
     if len([u for u in urls if good(u)]) < 25:
@@ -256,45 +360,110 @@ def discover_urls(base: str, limit=150, ignore_robots=False) -> list:
         urls.extend(crawled)
 
     # filter, dedupe, cap, content-type guard
-    host = urlparse(base).netloc
     urls = [u for u in urls if urlparse(u).netloc.endswith(host)]
     urls = [u for u in urls if good(u)]
-    deduped, seen = [], set()
-    for u in urls:
-        if u not in seen:
-            seen.add(u); deduped.append(u)
-        if len(deduped) >= limit: break
-    return deduped
+    return list(dict.fromkeys(urls))[:limit]
+
+_DROP_SEL = "script,style,noscript,svg"  # non-content nodes stripped before text extraction
 
 def fetch_clean(url: str) -> tuple[str, str]:
     r = fetch(url); r.raise_for_status()
     ctype = (r.headers.get("Content-Type") or "").lower()
     if "text/html" not in ctype:
         raise RuntimeError(f"skip non-HTML: {ctype}")
-    soup = BeautifulSoup(r.text, "html.parser")
-    title = (soup.title.string if soup.title and soup.title.string else url).strip()
-    for tag in soup(["script","style","noscript","svg"]): tag.decompose()
-    text = re.sub(r"\s+", " ", soup.get_text(separator=" ").strip())
+    tree = HTMLParser(body_text(r))
+    title_node = tree.css_first("title")
+    title = (title_node.text() if title_node and title_node.text() else url).strip()
+    for node in tree.css(_DROP_SEL): node.decompose()
+    root = tree.body or tree.root
+    # split()/join collapses and trims whitespace in one C pass, without a regex run over the whole page
+    text = " ".join((root.text(separator=" ") if root else "").split())
     return title, text
 
 def chunk(text: str, max_tokens=500, overlap=80):
+    """Yield (token_ids, text) per chunk so callers never need to re-encode."""
     # Ensure forward progress even if overlap >= max_tokens
     overlap = max(0, min(overlap, max_tokens - 1))
-    toks = ENC.encode(text)
-    i = 0
-    while i < len(toks):
-        j = min(i + max_tokens, len(toks))
-        yield ENC.decode(toks[i:j])
-        if j >= len(toks): break
-        i = j - overlap if j - i > overlap else j
-
-def embed_in_batches(client: OpenAI, texts: list[str], batch_size: int):
-    """Yield embeddings for texts in small batches to keep RAM low."""
-    for i in range(0, len(texts), batch_size):
-        batch = texts[i:i+batch_size]
-        resp = client.embeddings.create(model=EMBED_MODEL, input=batch)
-        for item in resp.data:
-            yield item.embedding
+    # encode_ordinary: page text never carries special tokens, so skip that scan
+    toks = ENC.encode_ordinary(text)
+    n = len(toks)
+    windows = []
+    for i in range(0, n, max_tokens - overlap):
+        j = min(i + max_tokens, n)
+        windows.append(toks[i:j])
+        if j >= n: break
+    # one batched (Rust-side) decode for all windows instead of a decode() call per chunk
+    yield from zip(windows, ENC.decode_batch(windows))
+
+def _pack_batches(texts: list, max_items: int, max_tokens: int):
+    """Greedily group inputs so each request stays under both the item and token caps."""
+    batch, batch_tokens = [], 0
+    for t in texts:
+        n = len(t) if isinstance(t, list) else len(ENC.encode(t))
+        if batch and (len(batch) >= max_items or batch_tokens + n > max_tokens):
+            yield batch
+            batch, batch_tokens = [], 0
+        batch.append(t); batch_tokens += n
+    if batch:
+        yield batch
+
+# Gate on embedding requests. A thread semaphore when building serially; with --workers the parent passes
+# one multiprocessing semaphore to every worker (_init_worker), so N processes still share one OpenAI quota.
+_EMBED_SLOTS = threading.BoundedSemaphore(EMBED_WORKERS)
+
+def _init_worker(embed_slots) -> None:
+    global _EMBED_SLOTS
+    _EMBED_SLOTS = embed_slots
+
+def _embed_request(client: OpenAI, batch: list) -> list:
+    for attempt in range(RETRY_TOTAL + 1):
+        try:
+            with _EMBED_SLOTS:
+                resp = client.embeddings.create(model=EMBED_MODEL, input=batch, **_DIM_KW)
+            return [item.embedding for item in resp.data]
+        except RateLimitError:
+            if attempt == RETRY_TOTAL:
+                raise
+            time.sleep(RETRY_BACKOFF * (2 ** attempt))
+
+def embed_in_batches(client: OpenAI, texts: list, batch_size: int):
+    """Yield embeddings for texts (strings or token-id lists), in order. Inputs are packed into
+    token-capped requests of at most batch_size items, sent EMBED_WORKERS at a time."""
+    batches = _pack_batches(texts, min(batch_size, EMBED_MAX_ITEMS), EMBED_BATCH_TOKENS)
+    with ThreadPoolExecutor(max_workers=EMBED_WORKERS) as ex:
+        for vecs in ex.map(lambda b: _embed_request(client, b), batches):
+            yield from vecs
+
+def _emb_key(text: str) -> bytes:
+    return hashlib.blake2b(f"{EMBED_MODEL}:{DIM}\0{text}".encode("utf-8"), digest_size=16).digest()
+
+def open_emb_cache(outdir: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(os.path.join(outdir, "emb_cache.sqlite"))
+    conn.execute("CREATE TABLE IF NOT EXISTS emb (h BLOB PRIMARY KEY, v BLOB)")
+    return conn
+
+def embed_with_cache(client: OpenAI, cache: sqlite3.Connection, docs: list[tuple[list[int], str]], batch_size: int) -> list:
+    """Embed (token_ids, text) chunks, reusing vectors cached by text hash; only misses go to OpenAI
+    (as token ids, so the API doesn't re-tokenise)."""
+    keys = [_emb_key(t) for _, t in docs]
+    found = {}
+    uniq = list(dict.fromkeys(keys))
+    for i in range(0, len(uniq), 500):  # stay under SQLite's bound-parameter limit
+        part = uniq[i:i+500]
+        rows = cache.execute(f"SELECT h, v FROM emb WHERE h IN ({','.join('?' * len(part))})", part)
+        for h, v in rows:
+            found[h] = np.frombuffer(v, dtype="float32")
+    misses = [i for i, k in enumerate(keys) if k not in found]
+    if misses:
+        new_rows = []
+        inputs = [docs[i][0][:EMBED_MAX_TOKENS] for i in misses]
+        for i, emb in zip(misses, embed_in_batches(client, inputs, batch_size)):
+            v = np.asarray(emb, dtype="float32")
+            found[keys[i]] = v
+            new_rows.append((keys[i], v.tobytes()))
+        cache.executemany("INSERT OR REPLACE INTO emb (h, v) VALUES (?, ?)", new_rows)
+        cache.commit()
+    return [found[k] for k in keys]
 
 def ensure_outdir(slug: str) -> str:
     d = os.path.join(OUT_ROOT, slug)
@@ -319,10 +488,16 @@ def build_for(name: str, base_url: str, limit_pages: int, max_chunks: int, batch
         sys.exit(1)
 
     # Prepare index + outputs
-    index = faiss.IndexFlatIP(DIM)
+    # 8-bit scalar quantisation: 1 byte per component instead of 4
+    index = faiss.IndexHNSWSQ(DIM, faiss.ScalarQuantizer.QT_8bit, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+    index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    index.hnsw.efSearch = HNSW_EF_SEARCH
     client = OpenAI()
-    meta_f = open(meta_path, "w", encoding="utf-8")
+    emb_cache = open_emb_cache(outdir)
+    meta_f = open(meta_path, "wb", buffering=1 << 20)
     added = 0
+    # Vectors accumulate here and go into FAISS in one add() at the end
+    X = np.empty((max_chunks, DIM), dtype="float32")
 
     docs_batch, metas_batch = [], []
     seen_chunks = set()  # md5 of text to reduce duplicates
@@ -330,42 +505,57 @@ def build_for(name: str, base_url: str, limit_pages: int, max_chunks: int, batch
     def flush_batch():
         nonlocal docs_batch, metas_batch, added
         if not docs_batch: return
-        vecs = list(embed_in_batches(client, docs_batch, batch))
-        X = np.asarray(vecs, dtype="float32")
-        faiss.normalize_L2(X)
-        index.add(X)
-        for m in metas_batch:
-            meta_f.write(json.dumps(m, ensure_ascii=False) + "\n")
+        vecs = embed_with_cache(client, emb_cache, docs_batch, batch)
+        X[added:added + len(vecs)] = vecs
+        meta_f.writelines(orjson.dumps(m, option=orjson.OPT_APPEND_NEWLINE) for m in metas_batch)
         added += len(metas_batch)
         docs_batch, metas_batch = [], []
 
-    # Stream pages → chunks → embed
-    for u in urls:
-        if added >= max_chunks: break
-        try:
-            title, text = fetch_clean(u)
-            for ch in chunk(text):
-                if added + len(metas_batch) >= max_chunks:
-                    break
-                h = hashlib.md5(ch.encode("utf-8")).hexdigest()
-                if h in seen_chunks:
-                    continue
-                seen_chunks.add(h)
-                docs_batch.append(ch)
-                metas_batch.append({"text": ch, "url": u, "title": title, "council": slug})
-                if len(docs_batch) >= batch:
-                    flush_batch()
-        except Exception as e:
-            print("   skip", u, str(e)[:120])
+    # Stream pages → chunks → embed (pages are fetched concurrently, consumed in order)
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as ex:
+        futs = [ex.submit(fetch_clean, u) for u in urls]
+        for u, fut in zip(urls, futs):
+            if added >= max_chunks: break
+            try:
+                title, text = fut.result()
+                for ids, ch in chunk(text):
+                    if added + len(metas_batch) >= max_chunks:
+                        break
+                    h = hashlib.md5(ch.encode("utf-8")).hexdigest()
+                    if h in seen_chunks:
+                        continue
+                    seen_chunks.add(h)
+                    docs_batch.append((ids, ch))
+                    metas_batch.append({"text": ch, "url": u, "title": title, "council": slug})
+                    if len(docs_batch) >= batch:
+                        flush_batch()
+            except Exception as e:
+                print("   skip", u, str(e)[:120])
+        for fut in futs:
+            fut.cancel()  # chunk cap reached: don't start the remaining fetches
 
     flush_batch()
     meta_f.close()
+    emb_cache.close()
+    if not added:
+        # An untrained HNSWSQ index can't be searched; with no index.faiss the retriever treats the council
+        # as unindexed. Drop any index/info left by an earlier build (meta.jsonl was just truncated).
+        for path in (faiss_path, info_path):
+            if os.path.exists(path):
+                os.remove(path)
+        print(f"  (!) No chunks kept for {name} — no index written.")
+        return
+    X = X[:added]
+    faiss.normalize_L2(X)
+    index.train(X)  # learns per-dimension ranges for the quantiser
+    index.add(X)
     faiss.write_index(index, faiss_path)
 
     # Write info for compatibility checks
     info = {
         "model": EMBED_MODEL,
         "dim": DIM,
+        "index": {"type": "HNSWSQ8", "metric": "ip", "m": HNSW_M, "ef_construction": HNSW_EF_CONSTRUCTION, "ef_search": HNSW_EF_SEARCH},
         "created": int(time.time()),
         "params": {
             "limit_pages": limit_pages,
@@ -380,15 +570,27 @@ def build_for(name: str, base_url: str, limit_pages: int, max_chunks: int, batch
         json.dump(info, f, indent=2)
     print(f"  ✓ Built {name} → {faiss_path}  ({added} chunks)")
 
+def build_one(name: str, base_url: str, limit_pages: int, max_chunks: int, batch: int, ignore_robots: bool):
+    """build_for() wrapper that reports errors instead of raising (safe to run in a worker process)."""
+    try:
+        build_for(name, base_url, limit_pages, max_chunks, batch, ignore_robots)
+    except Exception as e:
+        print("ERROR", name, e, flush=True)
+
 if __name__ == "__main__":
     ap = argparse.ArgumentParser()
     ap.add_argument("--only", help="Comma-separated council names", default="")
     ap.add_argument("--limit-pages", type=int, default=80, help="Max URLs per council to fetch")
     ap.add_argument("--max-chunks", type=int, default=1200, help="Max chunks per council")
-    ap.add_argument("--batch", type=int, default=12, help="Embedding batch size (lower = lower RAM)")
+    ap.add_argument("--batch", type=int, default=128, help="Chunks per embedding flush (packed into token-capped requests)")
     ap.add_argument("--ignore-robots", action="store_true", help="Ignore robots.txt (NOT recommended)")
+    ap.add_argument("--refresh", action="store_true", help="Clear the HTTP cache and re-download everything")
+    ap.add_argument("--workers", type=int, default=min(8, os.cpu_count() or 1), help="Councils to build in parallel (1 = serial)")
     args = ap.parse_args()
 
+    if args.refresh:
+        SESSION.cache.clear()
+
     try:
         data = json.load(open("councils.json", "r"))
     except Exception as e:
@@ -401,9 +603,22 @@ if __name__ == "__main__":
         names = [n for n in names if n in pick]
 
     t0 = time.time()
-    for n in names:
-        try:
-            build_for(n, data[n], args.limit_pages, args.max_chunks, args.batch, args.ignore_robots)
-        except Exception as e:
-            print("ERROR", n, e)
+    workers = max(1, min(args.workers, len(names)))
+    if workers == 1:
+        for n in names:
+            build_one(n, data[n], args.limit_pages, args.max_chunks, args.batch, args.ignore_robots)
+    else:
+        if not os.getenv("OPENAI_API_KEY"):
+            print("❌ OPENAI_API_KEY is not set.")
+            sys.exit(1)
+        # spawn (not fork) so each worker opens its own HTTP session, cache handle and OpenAI client
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                                 initializer=_init_worker, initargs=(ctx.BoundedSemaphore(EMBED_WORKERS),)) as ex:
+            futs = [
+                ex.submit(build_one, n, data[n], args.limit_pages, args.max_chunks, args.batch, args.ignore_robots)
+                for n in names
+            ]
+            for f in futs:
+                f.result()
     print(f"Done in {int(time.time()-t0)}s")
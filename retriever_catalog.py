@@ -3,7 +3,8 @@
 # API: answer(query: str, topic: Optional[str], council: str="wyndham", format: str="email") -> dict
 #
 # Behavior:
-# - Attempts to load a FAISS index at index/{council}/ and retrieve supporting snippets.
+# - Attempts to load the FAISS index + meta.jsonl that ingest.py wrote to index/{council}/ and retrieve supporting snippets
+#   (or asks a warm retriever_daemon.py over RETRIEVER_SOCKET, if configured).
 # - If OPENAI_API_KEY + langchain libs are available, it will fuse snippets into a short HTML response.
 # - If not, it falls back to high-quality templates per topic with official link registry.
 # - NEW: If catalog.json is present, prepend per-topic official links (e.g., Find My Bin Day) for the given council.
@@ -12,20 +13,41 @@
 # Safe to run without any extra deps: templates will still work.
 
 from __future__ import annotations
-import os, re, html, json, traceback, functools
-from typing import Dict, List, Tuple, Optional
+import os, re, html, logging, functools, threading, importlib.util
+from typing import Callable, Dict, List, NamedTuple, Tuple, Optional
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
 
 # --------------------------
 # Optional dependencies
 # --------------------------
-_LANGCHAIN_OK = True
+# These are heavy to import (hundreds of ms), so only their presence is checked here; the imports
+# happen on first use (_llm_summarize / _load_retriever) and the templated path never pays for them.
+def _has_module(name: str) -> bool:
+    try:
+        return importlib.util.find_spec(name) is not None
+    except Exception:
+        return False
+
+# langchain v0.1+ split across packages (only the chat model is used)
+_LANGCHAIN_OK = _has_module("langchain_openai")
+
+# Retrieval reads ingest.py's output directly: raw faiss index + meta.jsonl, OpenAI for query vectors
+_FAISS_OK = all(_has_module(m) for m in ("faiss", "numpy", "openai"))
+faiss = np = None
+
+# orjson parses catalog.json / meta.jsonl several times faster; stdlib json (which also takes bytes) is
+# only imported when orjson is missing. _json_dumps returns bytes either way (retriever_daemon.py wire format).
 try:
-    # langchain v0.1+ split across packages
-    from langchain_community.vectorstores import FAISS as FAISSStore
-    from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-    _ = OpenAIEmbeddings  # silence linters
+    import orjson
+    _json_loads = orjson.loads
+    _json_dumps = orjson.dumps
 except Exception:
-    _LANGCHAIN_OK = False
+    import json
+    _json_loads = json.loads
+    def _json_dumps(obj) -> bytes:
+        return json.dumps(obj).encode("utf-8")
 
 # --------------------------
 # Config / constants
@@ -36,17 +58,50 @@ MODEL_NAME = os.environ.get("OPENAI_MODEL", "gpt-4o-mini")  # inexpensive, fast;
 # Where your FAISS index lives (created by your ingest tool)
 INDEX_ROOT = os.environ.get("FAISS_INDEX_ROOT", os.environ.get("INDEX_ROOT", "index"))
 CATALOG_PATH = os.environ.get("CATALOG_PATH", "catalog.json")
+EMBED_MODEL = os.environ.get("EMBED_MODEL", "text-embedding-3-small")  # fallback if info.json lacks it
+
+# Optional warm retriever process (see retriever_daemon.py); empty = load FAISS in-process.
+# The socket is only used with an explicit shared secret; there is deliberately no default key.
+RETRIEVER_SOCKET = os.environ.get("RETRIEVER_SOCKET", "")
+RETRIEVER_AUTHKEY = os.environ.get("RETRIEVER_AUTHKEY", "").encode("utf-8")
+if RETRIEVER_SOCKET and not RETRIEVER_AUTHKEY:
+    logger.warning("RETRIEVER_SOCKET is set without RETRIEVER_AUTHKEY; ignoring it and retrieving in-process")
+# Window (ms) for coalescing concurrent lookups into one embedding call + one FAISS search; 0 = off
+RETRIEVER_BATCH_MS = float(os.environ.get("RETRIEVER_BATCH_MS", "0"))
+TOP_K = 6
+# Topic / suburb heuristics only read the head of the email; long pasted threads aren't scanned past this
+TOPIC_SCAN_CHARS = int(os.environ.get("TOPIC_SCAN_CHARS", "4096"))
 
 # --------------------------
 # Catalog support (optional)
 # --------------------------
-@functools.lru_cache(maxsize=1)
+# Parsed catalog, reloaded only when catalog.json's (mtime, size) changes; "links" holds the flat
+# {(council key, generic topic): (links, ...)} table derived from it (see _build_catalog_links)
+_CATALOG_CACHE: Dict[str, object] = {"key": None, "data": {}, "links": {}}
+_CATALOG_LOCK = threading.Lock()
+
 def _load_catalog() -> dict:
     try:
-        with open(CATALOG_PATH, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception:
-        return {}
+        st = os.stat(CATALOG_PATH)
+        key = (st.st_mtime_ns, st.st_size)
+    except OSError:
+        key = None
+    if key == _CATALOG_CACHE["key"]:
+        return _CATALOG_CACHE["data"]
+    with _CATALOG_LOCK:  # one thread re-parses; the others wait and reuse its result
+        if key != _CATALOG_CACHE["key"]:
+            data: dict = {}
+            if key is not None:
+                try:
+                    with open(CATALOG_PATH, "rb") as f:
+                        data = _json_loads(f.read())
+                except Exception:
+                    pass
+            # publish the links table before the key so a lock-free reader never pairs a new key with old links
+            _CATALOG_CACHE["data"], _CATALOG_CACHE["links"] = data, _build_catalog_links(data)
+            _CATALOG_CACHE["key"] = key
+            _render_templated.cache_clear()  # rendered bodies/links embed catalog entries
+        return _CATALOG_CACHE["data"]
 
 # Map generic topics -> catalog topic keys (tuned for Wyndham schema; extend per needs)
 CATALOG_TOPIC_MAP: Dict[str, List[str]] = {
@@ -68,31 +123,38 @@ _DEF_NAME_MAP = {
     "wyndham": "Wyndham City Council",
 }
 
-def _catalog_links_for(council_slug_or_name: str, topic: str) -> List[Dict[str, str]]:
-    cat = _load_catalog()
-    topic = (topic or "general info").lower()
-    # Prefer exact display name if present; else try a default mapping from slug
-    council_obj = cat.get(council_slug_or_name) or cat.get(_DEF_NAME_MAP.get(council_slug_or_name.lower(), ""))
-    if not council_obj:
-        # last resort: try title-cased key
-        council_obj = cat.get(council_slug_or_name.title())
-    if not council_obj:
-        return []
-    keys = CATALOG_TOPIC_MAP.get(topic, [])
-    topics_section = council_obj.get("topics", {})
-    out: List[Dict[str, str]] = []
-    seen = set()
-    for k in keys:
-        ent = topics_section.get(k)
-        if not ent:
+def _build_catalog_links(cat: dict) -> Dict[Tuple[str, str], Tuple[Dict[str, str], ...]]:
+    """Resolve CATALOG_TOPIC_MAP against every council's topics once per catalog load (de-duped by URL)."""
+    out: Dict[Tuple[str, str], Tuple[Dict[str, str], ...]] = {}
+    for council_key, council_obj in cat.items():
+        if not council_obj or not isinstance(council_obj, dict):
             continue
-        url = ent.get("url")
-        title = ent.get("title") or url
-        if url and url not in seen:
-            seen.add(url)
-            out.append({"title": title, "url": url})
+        topics_section = council_obj.get("topics", {})
+        for topic, keys in CATALOG_TOPIC_MAP.items():
+            links: List[Dict[str, str]] = []
+            seen = set()
+            for k in keys:
+                ent = topics_section.get(k)
+                if not ent:
+                    continue
+                url = ent.get("url")
+                title = ent.get("title") or url
+                if url and url not in seen:
+                    seen.add(url)
+                    links.append({"title": title, "url": url})
+                    _link_li(url, title)  # escape once here rather than on the first email that needs it
+            out[(council_key, topic)] = tuple(links)
     return out
 
+def _catalog_links_for(council_slug_or_name: str, topic: str) -> Tuple[Dict[str, str], ...]:
+    cat = _load_catalog()
+    topic = (topic or "general info").lower()
+    # Prefer exact display name if present; else try a default mapping from slug; last resort title-cased key
+    for key in (council_slug_or_name, _DEF_NAME_MAP.get(council_slug_or_name.lower(), ""), council_slug_or_name.title()):
+        if cat.get(key):
+            return _CATALOG_CACHE["links"].get((key, topic), ())
+    return ()
+
 # --------------------------
 # Curated defaults (used when no catalog or to supplement it)
 # --------------------------
@@ -213,10 +275,15 @@ TOPIC_TEMPLATES: Dict[str, str] = {
 # --------------------------
 # Utilities
 # --------------------------
-_SUBURB_POSTCODE_RE = re.compile(r"([A-Za-z][A-Za-z\s\-']+)\s*\(?([0-9]{4})\)?", flags=re.IGNORECASE)
+# Only tried where a run of name characters starts (the lookbehind), so a long run with no postcode
+# after it is scanned once rather than once per starting letter; the run already absorbs trailing spaces.
+_SUBURB_POSTCODE_RE = re.compile(r"(?<![A-Za-z\s\-'])[\s\-']*([A-Za-z][A-Za-z\s\-']+)\(?([0-9]{4})\)?", flags=re.IGNORECASE)
+
+# Tags and whitespace runs collapse to one space in a single pass
+_TAG_OR_WS_RE = re.compile(r"(?:<[^>]+>|\s)+")
 
 def _strip_html(s: str) -> str:
-    return re.sub(r"\s+", " ", re.sub(r"<[^>]+>", " ", s or "")).strip()
+    return _TAG_OR_WS_RE.sub(" ", s or "").strip()
 
 def _detect_suburb_and_postcode(text: str) -> Tuple[Optional[str], Optional[str]]:
     m = _SUBURB_POSTCODE_RE.search(text or "")
@@ -227,99 +294,273 @@ def _detect_suburb_and_postcode(text: str) -> Tuple[Optional[str], Optional[str]
             return suburb, pc
     return None, None
 
+# Topic keywords in priority order: when several topics match, the earliest one wins.
+_TOPIC_KEYWORDS: List[Tuple[str, Tuple[str, ...]]] = [
+    ("waste", ("bin", "bins", "waste", "rubbish", "recycling", "hard rubbish", "collection")),
+    ("rates", ("rate", "rates", "valuation", "instalment", "bpay")),
+    ("libraries", ("library", "libraries", "tarneit library", "werribee library", "point cook library", "hours")),
+    ("animals", ("dog", "cat", "pet", "animal", "microchip", "registration")),
+    ("opening hours", ("opening hours", "open today", "close", "closing time")),
+    ("parking", ("parking", "infringement", "fine", "ticket")),
+    ("planning", ("planning permit", "building permit", "planning", "overlays", "construction")),
+]
+_KW_PRIORITY: Dict[str, int] = {}
+for _i, (_topic, _kws) in enumerate(_TOPIC_KEYWORDS):
+    for _kw in _kws:
+        _KW_PRIORITY.setdefault(_kw, _i)
+
+# With pyahocorasick installed, one automaton pass over the text finds every keyword; otherwise
+# topics are checked in priority order with plain `kw in t` (C-level substring search, exits on the
+# first matching topic), which is far cheaper than a regex alternation over the whole email.
+try:
+    import ahocorasick
+    _TOPIC_AC = ahocorasick.Automaton()
+    for _kw, _i in _KW_PRIORITY.items():
+        _TOPIC_AC.add_word(_kw, _i)
+    _TOPIC_AC.make_automaton()
+except Exception:
+    _TOPIC_AC = None
+
+@functools.lru_cache(maxsize=1024)  # answer() passes at most TOPIC_SCAN_CHARS, bounding the keys
 def _pick_topic_heuristic(text: str) -> str:
     t = (text or "").lower()
-    def any_kw(*words):
-        return any(w in t for w in words)
-    if any_kw("bin", "bins", "waste", "rubbish", "recycling", "hard rubbish", "collection"):
-        return "waste"
-    if any_kw("rate", "rates", "valuation", "instalment", "bpay"):
-        return "rates"
-    if any_kw("library", "libraries", "tarneit library", "werribee library", "point cook library", "hours"):
-        return "libraries"
-    if any_kw("dog", "cat", "pet", "animal", "microchip", "registration"):
-        return "animals"
-    if any_kw("opening hours", "open today", "close", "closing time"):
-        return "opening hours"
-    if any_kw("parking", "infringement", "fine", "ticket"):
-        return "parking"
-    if any_kw("planning permit", "building permit", "planning", "overlays", "construction"):
-        return "planning"
-    return "general info"
-
-# Merge links from catalog + curated; de-dup by URL (catalog first, then curated)
-
-def _council_links(council: str, topic: str) -> List[Dict[str, str]]:
-    council = (council or "").strip() or "wyndham"
-    topic = (topic or "general info").lower()
+    if _TOPIC_AC is None:
+        for topic, kws in _TOPIC_KEYWORDS:
+            if any(k in t for k in kws):
+                return topic
+        return "general info"
+    best = len(_TOPIC_KEYWORDS)
+    for _, i in _TOPIC_AC.iter(t):
+        if i < best:
+            best = i
+            if best == 0:
+                break
+    return _TOPIC_KEYWORDS[best][0] if best < len(_TOPIC_KEYWORDS) else "general info"
+
+def _dedupe_links(links: List[Dict[str, str]], limit: Optional[int] = None) -> List[Dict[str, str]]:
+    """First occurrence of each URL, in order; stops scanning once `limit` distinct links are collected."""
     out: List[Dict[str, str]] = []
     seen = set()
-
-    # Catalog links first (if any)
-    for l in _catalog_links_for(council, topic):
+    for l in links:
         url = l.get("url")
         if url and url not in seen:
             seen.add(url); out.append(l)
+            if limit is not None and len(out) >= limit:
+                break
+    return out
 
-    # Curated defaults (by slug)
-    bank = COUNCIL_LINKS.get(council.lower(), {})
-    for l in bank.get(topic, []) + bank.get("general info", []):
-        url = l.get("url")
-        if url and url not in seen:
-            seen.add(url); out.append(l)
+# Curated links per council/topic, merged with that council's general links and de-duped once at import
+def _build_link_index() -> Dict[str, Dict[str, List[Dict[str, str]]]]:
+    index: Dict[str, Dict[str, List[Dict[str, str]]]] = {}
+    for council, bank in COUNCIL_LINKS.items():
+        general = bank.get("general info", [])
+        index[council] = {topic: _dedupe_links(links + general) for topic, links in bank.items()}
+    return index
+
+_CURATED_LINKS = _build_link_index()
+
+def _curated_links(council: str, topic: str) -> List[Dict[str, str]]:
+    per_topic = _CURATED_LINKS.get(council.lower())
+    if not per_topic:
+        return []
+    return per_topic.get(topic) or per_topic.get("general info", [])
+
+# Merge links from catalog + curated; de-dup by URL (catalog first, then curated)
 
-    return out[:8]
+def _council_links(council: str, topic: str) -> List[Dict[str, str]]:
+    council = (council or "").strip() or "wyndham"
+    topic = (topic or "general info").lower()
+    curated = _curated_links(council, topic)
+    catalog = _catalog_links_for(council, topic)
+    if not catalog:
+        return curated[:8]
+    return _dedupe_links([*catalog, *curated], limit=8)
 
 # --------------------------
 # Retrieval layer (optional)
 # --------------------------
 
-def _load_retriever(council: str):
-    """Try to build a FAISS retriever. Returns (retriever, embeddings) or (None, None) on failure."""
-    if not (_LANGCHAIN_OK and OPENAI_API_KEY):
-        return None, None
-    try:
-        idx_dir = os.path.join(INDEX_ROOT, council.lower())
-        index_path = os.path.join(idx_dir, "index.faiss")
-        if not os.path.exists(index_path):
-            return None, None
-        emb = OpenAIEmbeddings(openai_api_key=OPENAI_API_KEY)
-        store = FAISSStore.load_local(idx_dir, emb, allow_dangerous_deserialization=True)
-        return store.as_retriever(search_kwargs={"k": 6}), emb
-    except Exception:
-        return None, None
+class _CouncilIndex(NamedTuple):
+    index: object               # faiss index (vectors are L2-normalised, inner-product metric)
+    metas: List[Dict[str, str]]  # row i of meta.jsonl describes vector i
+    model: str                  # embedding model / size the index was built with (info.json)
+    dim: int
+
+# Loaded indexes per council (index read + meta parse happen once per process)
+_RETRIEVER_CACHE: Dict[str, _CouncilIndex] = {}
+_RETRIEVER_LOCK = threading.Lock()
+_OPENAI_CLIENT = None
+
+def _openai_client():
+    global _OPENAI_CLIENT
+    if _OPENAI_CLIENT is None:
+        from openai import OpenAI
+        _OPENAI_CLIENT = OpenAI(api_key=OPENAI_API_KEY)
+    return _OPENAI_CLIENT
+
+def _import_faiss() -> bool:
+    """Bind the faiss/numpy module globals on first use; a broken install disables retrieval for good."""
+    global faiss, np, _FAISS_OK
+    if faiss is None:
+        try:
+            import faiss as _faiss, numpy as _np
+            faiss, np = _faiss, _np
+        except Exception:
+            _FAISS_OK = False
+    return _FAISS_OK
+
+def _load_retriever(council: str) -> Optional[_CouncilIndex]:
+    """Try to load a council's FAISS index and metadata. Returns None on failure.
+    Successful loads are cached per council; misses are retried so a freshly built index is picked up."""
+    if not (_FAISS_OK and OPENAI_API_KEY):
+        return None
+    key = council.lower()
+    with _RETRIEVER_LOCK:
+        if key in _RETRIEVER_CACHE:
+            return _RETRIEVER_CACHE[key]
+        if not _import_faiss():
+            return None
+        try:
+            idx_dir = os.path.join(INDEX_ROOT, key)
+            index_path = os.path.join(idx_dir, "index.faiss")
+            if not os.path.exists(index_path):
+                return None
+            try:
+                index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP)
+            except Exception:  # not every index type supports mmap
+                index = faiss.read_index(index_path)
+            with open(os.path.join(idx_dir, "meta.jsonl"), "rb") as f:
+                metas = [_json_loads(line) for line in f if line.strip()]
+            info: dict = {}
+            try:
+                with open(os.path.join(idx_dir, "info.json"), "rb") as f:
+                    info = _json_loads(f.read())
+            except Exception:
+                pass
+            _RETRIEVER_CACHE[key] = _CouncilIndex(
+                index, metas, info.get("model", EMBED_MODEL), int(info.get("dim", index.d))
+            )
+            return _RETRIEVER_CACHE[key]
+        except Exception:
+            return None
+
+
+def _search_batch(council: str, queries: List[str]) -> List[List[Dict[str, str]]]:
+    """Embed all queries in one request and run one FAISS search over the stacked matrix."""
+    ci = _load_retriever(council)
+    if ci is None:
+        return [[] for _ in queries]
+    dim_kw = {} if ci.dim == 1536 else {"dimensions": ci.dim}
+    resp = _openai_client().embeddings.create(model=ci.model, input=list(queries), **dim_kw)
+    Q = np.asarray([d.embedding for d in resp.data], dtype="float32")
+    faiss.normalize_L2(Q)
+    D, I = ci.index.search(Q, TOP_K)
+    out: List[List[Dict[str, str]]] = []
+    for scores, row in zip(D, I):
+        snips = []
+        for score, i in zip(scores, row):
+            if i < 0 or i >= len(ci.metas):
+                continue
+            meta = ci.metas[i]
+            snips.append({
+                "text": meta.get("text") or "",
+                "source": meta.get("source") or meta.get("url") or "",
+                "title": meta.get("title") or "",
+                "score": float(score),
+            })
+        out.append(snips)
+    return out
+
+
+class _QueryBatcher:
+    """Coalesces lookups arriving within `window` seconds into one call of fn(items) -> results."""
+
+    def __init__(self, fn: Callable[[List[str]], List[object]], window: float):
+        self._fn = fn
+        self._window = window
+        self._lock = threading.Lock()
+        self._pending: List[Tuple[str, Future]] = []
+
+    def submit(self, item: str) -> object:
+        fut: Future = Future()
+        with self._lock:
+            self._pending.append((item, fut))
+            if len(self._pending) == 1:  # first in this window schedules the flush
+                threading.Timer(self._window, self._flush).start()
+        return fut.result()
+
+    def _flush(self) -> None:
+        with self._lock:
+            batch, self._pending = self._pending, []
+        try:
+            results = self._fn([item for item, _ in batch])
+            for (_, fut), res in zip(batch, results):
+                fut.set_result(res)
+        except Exception as e:
+            for _, fut in batch:
+                fut.set_exception(e)
+
+
+_BATCHERS: Dict[str, _QueryBatcher] = {}
+
+def _batcher_for(council: str) -> _QueryBatcher:
+    key = council.lower()
+    with _RETRIEVER_LOCK:
+        if key not in _BATCHERS:
+            _BATCHERS[key] = _QueryBatcher(functools.partial(_search_batch, council), RETRIEVER_BATCH_MS / 1000.0)
+        return _BATCHERS[key]
+
+
+_daemon_local = threading.local()
+
+def _retrieve_snippets_remote(query: str, council: str) -> Optional[List[Dict[str, str]]]:
+    """Ask retriever_daemon.py (over RETRIEVER_SOCKET) for snippets; None if it is unreachable."""
+    for _attempt in range(2):  # one reconnect if the cached connection went stale
+        conn = getattr(_daemon_local, "conn", None)
+        try:
+            if conn is None:
+                from multiprocessing.connection import Client
+                conn = Client(RETRIEVER_SOCKET, family="AF_UNIX", authkey=RETRIEVER_AUTHKEY)
+                _daemon_local.conn = conn
+            # JSON, not pickle: a reply is data, never something that gets to run code in this process
+            conn.send_bytes(_json_dumps({"query": query, "council": council}))
+            return _json_loads(conn.recv_bytes())
+        except Exception:
+            _daemon_local.conn = None
+            try:
+                if conn is not None:
+                    conn.close()
+            except Exception:
+                pass
+    return None
 
 
 def _retrieve_snippets(query: str, council: str) -> List[Dict[str, str]]:
     """Return a list of snippets: {"text": ..., "source": ..., "title": ...}"""
-    ret, _ = _load_retriever(council)
-    if not ret:
-        return []
+    if RETRIEVER_SOCKET and RETRIEVER_AUTHKEY:
+        remote = _retrieve_snippets_remote(query, council)
+        if remote is not None:
+            return remote
+    return _retrieve_snippets_local(query, council)
+
+
+def _retrieve_snippets_local(query: str, council: str) -> List[Dict[str, str]]:
     try:
-        docs = ret.get_relevant_documents(query)
-        out = []
-        for d in docs:
-            meta = getattr(d, "metadata", {}) or {}
-            out.append({
-                "text": d.page_content or "",
-                "source": meta.get("source") or meta.get("url") or "",
-                "title": meta.get("title") or "",
-            })
-        return out
+        if RETRIEVER_BATCH_MS > 0:
+            return _batcher_for(council).submit(query)
+        return _search_batch(council, [query])[0]
     except Exception:
         return []
 
 
 def _links_from_snippets(snips: List[Dict[str, str]]) -> List[Dict[str, str]]:
-    links: List[Dict[str, str]] = []
-    seen = set()
+    # url -> title of its first snippet; dict insertion order keeps the snippets' rank order
+    first: Dict[str, str] = {}
     for s in snips:
         url = (s.get("source") or "").strip()
-        if url and url not in seen and (url.startswith("http://") or url.startswith("https://")):
-            seen.add(url)
-            title = s.get("title") or "Source"
-            links.append({"title": title, "url": url})
-    return links
+        if url.startswith(("http://", "https://")):
+            first.setdefault(url, s.get("title") or "Source")
+    return [{"title": title, "url": url} for url, title in first.items()]
 
 # --------------------------
 # Optional LLM fusion (nice wording when available)
@@ -333,11 +574,22 @@ SYSTEM_EMAIL = (
 )
 
 
+# One chat client per model for the life of the process (keeps its HTTP connection pool warm)
+_CHAT_CLIENTS: Dict[str, object] = {}
+
+def _chat_client(model: str):
+    llm = _CHAT_CLIENTS.get(model)
+    if llm is None:
+        from langchain_openai import ChatOpenAI
+        llm = _CHAT_CLIENTS.setdefault(model, ChatOpenAI(model=model, temperature=0, api_key=OPENAI_API_KEY))
+    return llm
+
+
 def _llm_summarize(query: str, topic: str, suburb: Optional[str], snippets: List[Dict[str, str]]) -> Optional[str]:
     if not (_LANGCHAIN_OK and OPENAI_API_KEY):
         return None
     try:
-        llm = ChatOpenAI(model=MODEL_NAME, temperature=0, api_key=OPENAI_API_KEY)
+        llm = _chat_client(MODEL_NAME)
         context = "\n\n".join(f"[{i+1}] {s.get('text','')[:1200]}" for i, s in enumerate(snippets[:6]))
         suburb_line = f"User suburb context: {suburb}." if suburb else "User suburb context: (not provided)."
         msg = [
@@ -359,26 +611,37 @@ def _llm_summarize(query: str, topic: str, suburb: Optional[str], snippets: List
 # HTML builders
 # --------------------------
 
+# Escaped <li> per (url, title); curated links are rendered at import, catalog ones at catalog load,
+# RAG ones on first use
+@functools.lru_cache(maxsize=4096)
+def _link_li(url: str, title: str) -> str:
+    return f'<li><a href="{html.escape(url, quote=True)}">{html.escape(title)}</a></li>'
+
+for _bank in COUNCIL_LINKS.values():
+    for _links in _bank.values():
+        for _l in _links:
+            _link_li(_l["url"], _l["title"])
+
+
+# Static chrome of the email wrapper; only the body, links and quoted question vary per call
+_EMAIL_HEAD = '<div style="font-family:system-ui,Segoe UI,Roboto,Helvetica,Arial,sans-serif;font-size:15px;line-height:1.5">\n  '
+_EMAIL_QUOTE = (
+    '\n  <hr>\n  <p style="color:#777;margin-top:14px">Original question:</p>\n'
+    '  <blockquote style="margin:0 0 0 1em;color:#555;border-left:3px solid #ddd;padding-left:.8em">'
+)
+_EMAIL_TAIL = "</blockquote>\n</div>"
+
+
 def _wrap_email_html(user_text: str, body_html: str, links: List[Dict[str, str]]) -> str:
     links_html = ""
     if links:
-        items = "".join(
-            f'<li><a href="{html.escape(l["url"], quote=True)}">{html.escape(l["title"])}</a></li>'
-            for l in links[:8]
-        )
-        links_html = f"<p><strong>Official links:</strong></p><ul>{items}</ul>"
-
-    return (
-        f"""
-<div style="font-family:system-ui,Segoe UI,Roboto,Helvetica,Arial,sans-serif;font-size:15px;line-height:1.5">
-  {body_html}
-  {links_html}
-  <hr>
-  <p style="color:#777;margin-top:14px">Original question:</p>
-  <blockquote style="margin:0 0 0 1em;color:#555;border-left:3px solid #ddd;padding-left:.8em">{html.escape(_strip_html(user_text))}</blockquote>
-</div>
-""".strip()
-    )
+        items = "".join(_link_li(l["url"], l["title"]) for l in links[:8])
+        links_html = "<p><strong>Official links:</strong></p><ul>" + items + "</ul>"
+
+    return "".join((
+        _EMAIL_HEAD, body_html, "\n  ", links_html,
+        _EMAIL_QUOTE, html.escape(_strip_html(user_text)), _EMAIL_TAIL,
+    ))
 
 
 def _topic_intro(topic: str, suburb: Optional[str]) -> str:
@@ -389,15 +652,25 @@ def _topic_intro(topic: str, suburb: Optional[str]) -> str:
 # Small CTA that points explicitly to catalog’s bin-day tool if available
 
 def _bin_day_cta(council: str) -> str:
-    links = _catalog_links_for(council, "waste")
-    for l in links:
-        if "bin" in l.get("title", "").lower() and "day" in l.get("title", "").lower():
+    for l in _catalog_links_for(council, "waste"):
+        title = l.get("title", "").lower()
+        if "bin" in title and "day" in title:
             return (
                 f"<p><strong>Quick tip:</strong> Use <a href=\"{html.escape(l['url'])}\">{html.escape(l['title'])}</a> "
                 f"to check your collection day by address.</p>"
             )
     return ""
 
+# Template body + catalog/curated links (and their URL set, to seed RAG-link de-dup) depend only on
+# (topic, suburb, council), so render once
+@functools.lru_cache(maxsize=1024)
+def _render_templated(topic: str, suburb: Optional[str], council: str) -> Tuple[str, Tuple[Dict[str, str], ...], frozenset]:
+    template_html = TOPIC_TEMPLATES.get(topic, TOPIC_TEMPLATES["general info"])
+    intro = _topic_intro(topic, suburb)
+    cta = _bin_day_cta(council) if topic == "waste" else ""
+    links = _dedupe_links([*_catalog_links_for(council, topic), *_curated_links(council, topic)])
+    return intro + cta + template_html, tuple(links), frozenset(l["url"] for l in links)
+
 # --------------------------
 # Public API
 # --------------------------
@@ -411,8 +684,12 @@ def answer(query: str, topic: Optional[str] = None, council: str = "wyndham", fo
       }
     """
     try:
-        topic_final = (topic or _pick_topic_heuristic(query)).lower()
-        suburb, _pc = _detect_suburb_and_postcode(query)
+        head = query[:TOPIC_SCAN_CHARS] if query else ""
+        topic_final = (topic or _pick_topic_heuristic(head)).lower()
+        # Suburb only feeds the waste intro and the LLM prompt; skip the scan when neither will use it
+        suburb = None
+        if topic_final == "waste" or (_LANGCHAIN_OK and OPENAI_API_KEY):
+            suburb, _pc = _detect_suburb_and_postcode(head)
 
         # Retrieval + RAG links
         snippets = _retrieve_snippets(query, council)
@@ -421,36 +698,33 @@ def answer(query: str, topic: Optional[str] = None, council: str = "wyndham", fo
         # LLM wording if available
         llm_html = _llm_summarize(query=query, topic=topic_final, suburb=suburb, snippets=snippets)
 
-        # Fallback body from templates (+ optional bin-day CTA)
-        template_html = TOPIC_TEMPLATES.get(topic_final, TOPIC_TEMPLATES["general info"])
-        intro = _topic_intro(topic_final, suburb)
-        cta = _bin_day_cta(council) if topic_final == "waste" else ""
-        body_html = llm_html or (intro + cta + template_html)
+        # Fallback body from templates (+ optional bin-day CTA) and catalog/curated links
+        _load_catalog()  # stat catalog.json first so an edited file invalidates cached renders
+        template_html, base_links, base_urls = _render_templated(topic_final, suburb if topic_final == "waste" else None, council)
+        body_html = llm_html or template_html
 
         # Merge links: catalog → curated → RAG
-        merged: List[Dict[str, str]] = []
-        seen = set()
-        for source in (
-            _catalog_links_for(council, topic_final),
-            COUNCIL_LINKS.get(council.lower(), {}).get(topic_final, []) + COUNCIL_LINKS.get(council.lower(), {}).get("general info", []),
-            rag_links,
-        ):
-            for l in source:
-                url = l.get("url")
-                if url and url not in seen:
-                    seen.add(url); merged.append(l)
+        merged: List[Dict[str, str]] = list(base_links)
+        if rag_links:
+            seen = set(base_urls)
+            for l in rag_links:
+                if l["url"] not in seen:
+                    seen.add(l["url"]); merged.append(l)
         if not merged:
-            merged = _catalog_links_for(council, "general info") or COUNCIL_LINKS.get(council.lower(), {}).get("general info", [])
+            merged = list(_catalog_links_for(council, "general info") or _curated_links(council, "general info"))
 
-        html_email = _wrap_email_html(user_text=query, body_html=body_html, links=merged)
+        # The worker asks for format="body" and wraps the reply itself: only render the <li> list,
+        # quote and chrome when they are actually returned
+        if format == "email":
+            body_html = _wrap_email_html(user_text=query, body_html=body_html, links=merged)
 
         return {
-            "answer_html": html_email if format == "email" else body_html,
+            "answer_html": body_html,
             "links": merged,
         }
 
     except Exception:
-        traceback.print_exc()
+        logger.exception("retriever_catalog.answer failed (council=%s, topic=%s)", council, topic)
         fallback_links = _council_links(council, "general info")
         return {
             "answer_html": (
@@ -0,0 +1,85 @@
+# retriever_daemon.py — keeps FAISS retrievers warm in one long-lived process
+# retriever_catalog.answer() sends {"query", "council"} here over a UNIX socket when
+# RETRIEVER_SOCKET is set, so web/worker processes skip the faiss/openai import + index load.
+#
+# Usage:
+#   export RETRIEVER_AUTHKEY="$(openssl rand -hex 32)" RETRIEVER_SOCKET="$XDG_RUNTIME_DIR/civreply-retriever.sock"
+#   python3 retriever_daemon.py --preload wyndham
+#   streamlit run app.py
+#
+# ENV:
+#   RETRIEVER_SOCKET=...                   # same value for clients; default $XDG_RUNTIME_DIR/civreply-retriever.sock,
+#                                          # else a 0700 per-user dir under the temp dir
+#   RETRIEVER_AUTHKEY=...                  # required shared secret; neither side uses the socket without it
+#   RETRIEVER_BATCH_MS=5                   # optional: coalesce concurrent lookups into batched searches
+#   OPENAI_API_KEY, FAISS_INDEX_ROOT       # as for retriever_catalog
+
+from __future__ import annotations
+import os, sys, stat, argparse, tempfile, threading, traceback
+from multiprocessing.connection import Listener
+
+import retriever_catalog as rc
+
+
+def handle(conn) -> None:
+    with conn:
+        while True:
+            try:
+                raw = conn.recv_bytes()
+            except (EOFError, OSError):
+                return
+            try:
+                req = rc._json_loads(raw)
+                out = rc._retrieve_snippets_local(str(req.get("query", "")), str(req.get("council", "")))
+            except Exception:
+                traceback.print_exc()
+                out = []
+            conn.send_bytes(rc._json_dumps(out))
+
+
+def default_socket_path() -> str:
+    base = os.environ.get("XDG_RUNTIME_DIR")  # per-user, 0700, cleared on logout
+    if not base:
+        base = os.path.join(tempfile.gettempdir(), f"civreply-{os.getuid()}")
+        os.makedirs(base, mode=0o700, exist_ok=True)
+        st = os.lstat(base)
+        if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o077:
+            raise SystemExit(f"{base} is not a private directory owned by this user; set RETRIEVER_SOCKET")
+    return os.path.join(base, "civreply-retriever.sock")
+
+
+def serve(path: str, preload: list[str]) -> None:
+    for c in preload:
+        ci = rc._load_retriever(c)
+        print(f"• preload {c}: {f'{len(ci.metas)} chunks' if ci else 'no index'}", flush=True)
+    if os.path.lexists(path):
+        st = os.lstat(path)
+        if not stat.S_ISSOCK(st.st_mode) or st.st_uid != os.getuid():
+            raise SystemExit(f"{path} exists and is not our stale socket; refusing to remove it")
+        os.remove(path)  # stale socket from a previous run
+    old_umask = os.umask(0o177)  # socket is created 0600, with no window before a chmod
+    try:
+        listener = Listener(path, family="AF_UNIX", authkey=rc.RETRIEVER_AUTHKEY)
+    finally:
+        os.umask(old_umask)
+    with listener:
+        print(f"Retriever daemon listening on {path}", flush=True)
+        while True:
+            try:
+                conn = listener.accept()
+            except Exception as e:  # failed auth handshake etc.
+                print("accept failed:", e, flush=True)
+                continue
+            threading.Thread(target=handle, args=(conn,), daemon=True).start()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--socket", default=rc.RETRIEVER_SOCKET, help="UNIX socket path (default: private per-user dir)")
+    ap.add_argument("--preload", default="", help="Comma-separated council slugs to load at startup")
+    args = ap.parse_args()
+    if not rc.RETRIEVER_AUTHKEY:
+        raise SystemExit("RETRIEVER_AUTHKEY is required (a long random shared secret, same value for clients)")
+    if not (rc._FAISS_OK and rc.OPENAI_API_KEY):
+        print("⚠️ faiss/numpy/openai or OPENAI_API_KEY missing — the daemon will return no snippets.", file=sys.stderr)
+    serve(args.socket or default_socket_path(), [c.strip() for c in args.preload.split(",") if c.strip()])
@@ -14,20 +14,31 @@
 #   GREEN_TOPICS="waste,rates,libraries,animals,opening hours,general info"
 #   COUNCIL_NAME="wyndham"
 #   POLL_SECONDS=30
+#   POLL_MAX_SECONDS=300          # ceiling for the idle backoff (set equal to POLL_SECONDS to disable)
 #   REPLY_SIGNATURE="—\nWyndham Information Assistant\n(This is an automated reply)"
 #   CATEGORY_REPLIED="AutoReplied"
 #   CATEGORY_NEEDS_REVIEW="Needs review"
-#   STATE_PATH="/tmp/processed_ids.json"
+#   STATE_PATH="/tmp/processed_ids.json"  # newline-delimited message ids (legacy JSON list still read)
 #   SKIP_NOREPLY=1|0              # default 1: skip senders like no-reply@
+#   DRAFT_RED=0|1                 # default 0: RED-risk mail is tagged for review without a generated draft
+#   REDIS_URL=redis://...         # optional: replicas share per-message claims so only one answers each mail
+#   TOPIC_SCAN_CHARS=4096         # topic classification only reads this many leading chars
+#   STATE_MAX_IDS=50000           # processed ids remembered (least recently seen are dropped)
+#   WORKER_THREADS=8              # unread messages processed in parallel (1 = sequential)
+#   GRAPH_CONCURRENCY=4           # Graph requests in flight at once across those threads
+#   GRAPH_RPS=15                  # token-bucket cap on Graph requests/second (0 = off)
 #   OPENAI_API_KEY=...            # optional (nicer wording via retriever)
 #   OPENAI_MODEL=gpt-4o-mini      # optional
 #   CATALOG_PATH=./catalog.json   # optional
 #   FAISS_INDEX_ROOT=index        # optional
 from __future__ import annotations
 
-import os, re, json, time, traceback
-from datetime import datetime, timezone
+import os, re, json, time, functools, queue, threading, logging, logging.handlers
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from html import unescape as _html_unescape
 import requests
+from urllib3.util.retry import Retry
 
 # ====== ENV ======
 TENANT_ID         = os.environ.get("GRAPH_TENANT_ID", "")
@@ -41,12 +52,27 @@ GREEN_TOPICS_ENV  = os.environ.get("GREEN_TOPICS", "waste,rates,libraries,animal
 COUNCIL_NAME      = os.environ.get("COUNCIL_NAME", "wyndham")
 
 POLL_SECONDS      = int(os.environ.get("POLL_SECONDS", "30"))
+# Idle polls back off (doubling) up to this; any new unread mail drops straight back to POLL_SECONDS
+POLL_MAX_SECONDS  = max(POLL_SECONDS, int(os.environ.get("POLL_MAX_SECONDS", "300")))
 REPLY_SIGNATURE   = os.environ.get("REPLY_SIGNATURE", "—\nWyndham Information Assistant\n(This is an automated reply)")
 
 CATEGORY_REPLIED  = os.environ.get("CATEGORY_REPLIED", "AutoReplied")
 CATEGORY_NEEDSREV = os.environ.get("CATEGORY_NEEDS_REVIEW", "Needs review")
 STATE_PATH        = os.environ.get("STATE_PATH", "/tmp/processed_ids.json")
 SKIP_NOREPLY      = os.environ.get("SKIP_NOREPLY", "1") == "1"
+# RED mail (FOI, legal, injury, ...) always goes to a human; by default it is only tagged, not pre-drafted
+DRAFT_RED         = os.environ.get("DRAFT_RED", "0") == "1"
+# Topic signal sits at the top of an email; long pasted threads aren't scanned past this (risk still sees all)
+TOPIC_SCAN_CHARS  = int(os.environ.get("TOPIC_SCAN_CHARS", "4096"))
+# Dedupe memory is an LRU of this many ids; anything older has long left the unread Inbox listing
+STATE_MAX_IDS     = int(os.environ.get("STATE_MAX_IDS", "50000"))
+# Messages handled concurrently per poll; each spends most of its time waiting on Graph/OpenAI I/O
+WORKER_THREADS    = max(1, int(os.environ.get("WORKER_THREADS", "8")))
+# Exchange Online allows only a few concurrent requests per app per mailbox; extra threads queue here
+# instead of drawing 429s (retrieval/LLM work still runs WORKER_THREADS wide)
+GRAPH_CONCURRENCY = max(1, int(os.environ.get("GRAPH_CONCURRENCY", "4")))
+# Average Graph request rate (a $batch counts once per sub-request); bursts up to twice this. 0 = unlimited
+GRAPH_RPS         = float(os.environ.get("GRAPH_RPS", "15"))
 
 AUTH_SCOPE = "https://graph.microsoft.com/.default"
 GRAPH_BASE = "https://graph.microsoft.com/v1.0"
@@ -54,14 +80,78 @@ TOKEN_URL  = f"https://login.microsoftonline.com/{TENANT_ID}/oauth2/v2.0/token"
 
 session = requests.Session()
 session.headers["Content-Type"] = "application/json"
+# Keep one pooled connection per worker thread (requests' default pool holds 10). Throttling (429) and
+# 503 mean Graph did not act on the request, so even POSTs are retried, honouring Retry-After and otherwise
+# backing off 0.8s, 1.6s, 3.2s...; ambiguous failures (other 5xx, read timeouts) are left to the next poll
+# so a reply is never sent twice.
+_GRAPH_RETRY = Retry(
+    total=4, connect=3, read=0, backoff_factor=0.8,
+    status_forcelist=(429, 503), allowed_methods=frozenset({"GET", "POST", "PATCH"}),
+    respect_retry_after_header=True, raise_on_status=False,
+)
+session.mount("https://", requests.adapters.HTTPAdapter(pool_maxsize=max(10, WORKER_THREADS + 2), max_retries=_GRAPH_RETRY))
+_GRAPH_SLOTS = threading.BoundedSemaphore(GRAPH_CONCURRENCY)
+
+class _TokenBucket:
+    """Average `rate` acquisitions/second with bursts up to `burst`; acquire() blocks until allowed."""
+    def __init__(self, rate: float, burst: float):
+        self.rate, self.burst = rate, burst
+        self.tokens, self.stamp = burst, time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, n: float = 1) -> None:
+        n = min(n, self.burst)
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+            self.stamp = now
+            self.tokens -= n  # may go negative: later callers queue behind the debt
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+
+_GRAPH_BUCKET = _TokenBucket(GRAPH_RPS, 2 * GRAPH_RPS) if GRAPH_RPS > 0 else None
+
+def graph_request(method: str, url: str, cost: int = 1, **kwargs):
+    """session.request for Graph, paced by GRAPH_RPS and limited to GRAPH_CONCURRENCY in flight."""
+    if _GRAPH_BUCKET is not None:
+        _GRAPH_BUCKET.acquire(cost)
+    with _GRAPH_SLOTS:
+        return session.request(method, url, **kwargs)
+
+# orjson encodes Graph payloads straight to UTF-8 bytes and parses responses several times faster;
+# stdlib json is the fallback
+try:
+    import orjson
+    _json_dumps, _json_loads = orjson.dumps, orjson.loads
+except Exception:
+    _json_dumps, _json_loads = json.dumps, json.loads
 
-def log(msg: str) -> None:
-    print(f"[{datetime.now(timezone.utc).isoformat()}] {msg}", flush=True)
+# Worker events go through logging like the library loggers: the timestamp is only formatted, and the
+# write only happens, on the QueueListener thread set up in setup_logging() (no flush per line)
+logger = logging.getLogger("worker_autoreply")
+log = logger.info
 
 # ====== TOKEN ======
+# Client-credential tokens last about an hour: reuse one until TOKEN_REFRESH_MARGIN before expiry, or until
+# Graph answers 401 (invalidate_token), instead of a login round trip every poll. The margin covers a long
+# poll cycle (up to UNREAD_MAX_PER_POLL messages) still using the token it started with; expiry is tracked
+# on the monotonic clock so wall-clock adjustments can't stretch or cut a token's lifetime.
+TOKEN_REFRESH_MARGIN = 120
+_TOKEN = {"value": None, "exp": 0.0}
+
+def invalidate_token() -> None:
+    _TOKEN["exp"] = 0.0
+
 def get_token() -> str:
-    resp = requests.post(
+    now = time.monotonic()
+    if _TOKEN["value"] and now < _TOKEN["exp"] - TOKEN_REFRESH_MARGIN:
+        return _TOKEN["value"]
+    # Through the shared session so the login.microsoftonline.com connection is kept alive between polls;
+    # the session's JSON Content-Type default is overridden for this form-encoded body
+    resp = session.post(
         TOKEN_URL,
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
         data={
             "client_id": CLIENT_ID,
             "client_secret": CLIENT_SECRET,
@@ -71,26 +161,125 @@ def get_token() -> str:
         timeout=20,
     )
     resp.raise_for_status()
-    return resp.json()["access_token"]
+    data = _json_loads(resp.content)
+    _TOKEN["value"], _TOKEN["exp"] = data["access_token"], now + float(data.get("expires_in") or 0)
+    return _TOKEN["value"]
 
 def graph_headers(token: str):
     return {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
 
 # ====== SIMPLE STATE (dedupe) ======
+# One id per line, appended as each message is handled, so a save costs one short write however long the
+# history; the file is rewritten from the in-memory set only once stale lines outnumber it STATE_COMPACT_FACTOR
+# to 1. A legacy JSON-list state file is still read and rewritten in the new format. processed_ids is an
+# insertion-ordered LRU capped at STATE_MAX_IDS, and the file keeps that order so a restart keeps the newest.
+STATE_COMPACT_FACTOR = 10
+_state_lines = 0
+_state_fh = None  # line-buffered append handle, opened on first use and reopened after each compaction
+_STATE_LOCK = threading.Lock()  # processed_ids and the state file are shared by the WORKER_THREADS pool
+
 def load_state():
+    global _state_lines
     try:
-        return set(json.load(open(STATE_PATH)))
+        with open(STATE_PATH, encoding="utf-8") as f:
+            raw = f.read()
     except Exception:
-        return set()
+        return OrderedDict()
+    if raw.lstrip().startswith("["):
+        try:
+            s = OrderedDict.fromkeys(_json_loads(raw)[-STATE_MAX_IDS:])
+        except Exception:
+            return OrderedDict()
+        save_state(s)
+        return s
+    ids = raw.split()
+    _state_lines = len(ids)
+    return OrderedDict.fromkeys(ids[-STATE_MAX_IDS:])
 
 def save_state(s):
+    # Full rewrite (compaction); tmp + replace so a crash mid-write never truncates the history
+    global _state_lines, _state_fh
     try:
-        json.dump(list(s), open(STATE_PATH, "w"))
+        tmp = STATE_PATH + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write("".join(f"{i}\n" for i in s))
+        os.replace(tmp, STATE_PATH)
+        _state_lines = len(s)
     except Exception:
-        pass
+        return
+    if _state_fh is not None:  # still points at the replaced file
+        _state_fh.close(); _state_fh = None
+
+_in_flight = set()  # ids a pool thread is answering right now; guarded by _STATE_LOCK
+
+def begin_processing(msg_id: str) -> bool:
+    # Check-and-record in one step, so two threads handed the same id can never both reply to it
+    with _STATE_LOCK:
+        if msg_id in processed_ids:
+            processed_ids.move_to_end(msg_id)
+            return False
+        if msg_id in _in_flight:
+            return False
+        _in_flight.add(msg_id)
+        return True
+
+def end_processing(msg_id: str) -> None:
+    with _STATE_LOCK:
+        _in_flight.discard(msg_id)
+
+def mark_processed(msg_id: str) -> None:
+    global _state_lines, _state_fh
+    with _STATE_LOCK:
+        processed_ids[msg_id] = None
+        processed_ids.move_to_end(msg_id)
+        while len(processed_ids) > STATE_MAX_IDS:
+            processed_ids.popitem(last=False)
+        try:
+            if _state_fh is None:
+                _state_fh = open(STATE_PATH, "a", encoding="utf-8", buffering=1)
+            _state_fh.write(f"{msg_id}\n")
+            _state_lines += 1
+        except Exception:
+            return
+        if _state_lines > STATE_COMPACT_FACTOR * len(processed_ids):
+            save_state(processed_ids)
 
 processed_ids = load_state()
 
+# ====== SHARED CLAIMS (optional) ======
+# With REDIS_URL set, replicas polling the same mailbox claim each new message id (SET NX, CLAIM_TTL expiry)
+# before fetching it, so exactly one of them answers; a failed attempt releases its claim for the next poll.
+# Without it the local state file is the only guard, which is right for a single worker.
+REDIS_URL = os.environ.get("REDIS_URL", "")
+CLAIM_TTL = 7 * 86400
+_redis = None
+if REDIS_URL:
+    try:
+        import redis
+        _redis = redis.Redis.from_url(REDIS_URL)
+    except Exception as e:
+        logger.warning("REDIS_URL set but redis is unavailable (%s); running without shared claims", e)
+
+def claim_messages(msg_ids):
+    """The subset of msg_ids this replica now owns (all of them without Redis)."""
+    if _redis is None or not msg_ids:
+        return list(msg_ids)
+    try:
+        pipe = _redis.pipeline(transaction=False)
+        for mid in msg_ids:
+            pipe.set(f"civreply:mid:{mid}", "1", nx=True, ex=CLAIM_TTL)
+        return [mid for mid, ok in zip(msg_ids, pipe.execute()) if ok]
+    except Exception as e:
+        log(f"Claim failed, skipping this poll's new messages: {e}")  # never risk a double reply
+        return []
+
+def release_claim(msg_id: str) -> None:
+    if _redis is not None:
+        try:
+            _redis.delete(f"civreply:mid:{msg_id}")
+        except Exception:
+            pass
+
 # ====== TOPIC CLASSIFIER ======
 GREEN_TOPICS = [t.strip().lower() for t in GREEN_TOPICS_ENV.split(",") if t.strip()]
 TOPIC_KEYWORDS = {
@@ -101,30 +290,84 @@ TOPIC_KEYWORDS = {
     "opening hours": ["opening hours","hours","what time","open today","public holiday hours","closing time"],
     "general info": ["information","contact","help","assistance","services"],
 }
+# Flat parallel tables: topic i is _TOPIC_NAMES[i]; each keyword maps to the indices of the topics listing it
+_TOPIC_NAMES = tuple(TOPIC_KEYWORDS)
+_KW_TOPICS = {}
+for _i, _kws in enumerate(TOPIC_KEYWORDS.values()):
+    for _kw in _kws:
+        _KW_TOPICS[_kw] = _KW_TOPICS.get(_kw, ()) + (_i,)
+
+# With pyahocorasick installed, one automaton pass finds every keyword (overlaps included); otherwise
+# plain `kw in t` checks, which are C-level substring searches and far cheaper than a regex alternation.
+try:
+    import ahocorasick
+    _TOPIC_AC = ahocorasick.Automaton()
+    for _kw in _KW_TOPICS:
+        _TOPIC_AC.add_word(_kw, _kw)
+    _TOPIC_AC.make_automaton()
+except Exception:
+    _TOPIC_AC = None
+
+# Repeated / templated enquiries skip the scan; callers pass at most TOPIC_SCAN_CHARS, bounding the keys
+@functools.lru_cache(maxsize=1024)
 def classify_topic(text: str):
     t = (text or "").lower()
-    scores = {topic: 0 for topic in TOPIC_KEYWORDS}
-    for topic, kws in TOPIC_KEYWORDS.items():
-        for kw in kws:
-            if kw in t:
-                scores[topic] += 1
-    topic = max(scores, key=scores.get)
-    if scores[topic] == 0:
-        topic = "general info"
+    if _TOPIC_AC is not None:
+        found = {kw for _, kw in _TOPIC_AC.iter(t)}
+    else:
+        found = [kw for kw in _KW_TOPICS if kw in t]
+    scores = [0] * len(_TOPIC_NAMES)
+    for kw in found:
+        for i in _KW_TOPICS[kw]:
+            scores[i] += 1
+    best = max(range(len(scores)), key=scores.__getitem__)  # first topic wins ties, as before
+    topic = _TOPIC_NAMES[best] if scores[best] else "general info"
     return topic, (topic in GREEN_TOPICS)
 
 # ====== RISK HEURISTICS ======
 AMBER_TRIGGERS = ["complaint","unhappy","delay","refund","appeal","escalate","supervisor","deadline","urgent","threat","media","ombudsman","privacy","frustrated","angry"]
 RED_TRIGGERS   = ["foi","freedom of information","accident","injury","legal","threaten","assault","payment dispute","chargeback","personal information request","vulnerable","danger","police"]
 PII_PATTERNS   = [re.compile(r"\b\d{8,}\b"), re.compile(r"\b\+?\d{9,15}\b")]
+# Both PII patterns need a run of 8+ digits: mapping ASCII digits to "0" (1:1 translate, C fast path)
+# and one substring test rules that out ~30x cheaper than the regexes; non-ASCII text skips the prefilter.
+_DIGITS_TO_ZERO = str.maketrans("0123456789", "0000000000")
+def _may_contain_pii(t: str) -> bool:
+    return not t.isascii() or "00000000" in t.translate(_DIGITS_TO_ZERO)
+
+# Same optional automaton as the topic scan: one pass over the whole email instead of up to 28 substring
+# scans (RED wins, so a RED hit ends the pass early); without pyahocorasick the ordered `any` checks remain.
+try:
+    import ahocorasick
+    _RISK_AC = ahocorasick.Automaton()
+    for _lvl, _kws in ((1, AMBER_TRIGGERS), (2, RED_TRIGGERS)):
+        for _kw in _kws:
+            _RISK_AC.add_word(_kw, max(_lvl, _RISK_AC.get(_kw, 0)))
+    _RISK_AC.make_automaton()
+except Exception:
+    _RISK_AC = None
+
+def _trigger_level(t: str) -> int:
+    """2 if a RED trigger occurs in t, 1 if only AMBER ones do, else 0."""
+    if _RISK_AC is not None:
+        level = 0
+        for _, lvl in _RISK_AC.iter(t):
+            if lvl == 2:
+                return 2
+            level = 1
+        return level
+    if any(k in t for k in RED_TRIGGERS):
+        return 2
+    return 1 if any(k in t for k in AMBER_TRIGGERS) else 0
+
 def classify_risk(text: str):
     t = (text or "").lower()
     risk, reasons = "GREEN", []
-    if any(k in t for k in RED_TRIGGERS):
+    level = _trigger_level(t)
+    if level == 2:
         risk = "RED"; reasons.append("High-risk keyword")
-    elif any(k in t for k in AMBER_TRIGGERS):
+    elif level == 1:
         risk = "AMBER"; reasons.append("Potential complaint/escalation")
-    if any(p.search(t) for p in PII_PATTERNS):
+    if _may_contain_pii(t) and any(p.search(t) for p in PII_PATTERNS):
         if risk == "GREEN": risk = "AMBER"
         reasons.append("PII detected")
     if not reasons: reasons.append("No risk triggers detected")
@@ -143,6 +386,34 @@ def looks_like_noreply(address: str) -> bool:
     a = (address or "").lower()
     return ("no-reply@" in a) or ("noreply@" in a) or ("donotreply@" in a)
 
+# RFC 3834 Auto-Submitted (anything but "no") plus the common vendor autoresponder markers
+AUTO_REPLY_HEADERS = ("auto-submitted", "x-autoreply", "x-autorespond")
+def has_auto_reply_header(headers) -> bool:
+    for h in headers or ():
+        name = (h.get("name") or "").lower()
+        if name in AUTO_REPLY_HEADERS and not (name == "auto-submitted" and (h.get("value") or "").strip().lower() == "no"):
+            return True
+    return False
+
+def _sender_address(msg: dict) -> str:
+    return ((msg.get("from") or {}).get("emailAddress") or {}).get("address", "").strip()
+
+def loop_guard(msg: dict):
+    """Log line for a message we must never answer (self, autoresponder, bounce, no-reply), else None.
+    Works on the list_unread_messages fields too, so most of these skip the body fetch entirely."""
+    msg_id = msg.get("id")
+    subject = (msg.get("subject") or "").strip()
+    sender = _sender_address(msg)
+    if sender and MAILBOX_ADDRESS and sender.lower() == MAILBOX_ADDRESS.lower():
+        return f"Skip self {msg_id}"
+    if looks_like_auto_reply(subject):
+        return f"Skip auto-reply {msg_id}: {subject!r}"
+    if SKIP_NOREPLY and looks_like_noreply(sender):
+        return f"Skip no-reply sender {sender}"
+    if has_auto_reply_header(msg.get("internetMessageHeaders")):
+        return f"Skip auto-submitted {msg_id}: {subject!r}"
+    return None
+
 # ====== RETRIEVER ======
 # Expect: retriever_catalog.answer(query, topic=None, council="wyndham", format="body")
 try:
@@ -161,99 +432,219 @@ except Exception:
         ]
         return {"answer_html": base, "links": links}
 
+# Form-generated mail (e.g. "missed bin" submissions) repeats the exact same subject/body; reuse the answer.
+# Keyed on the whole whitespace-collapsed text so any difference, however late in the email, misses.
+# Entries expire after ANSWER_CACHE_TTL so catalog/index updates reach repeat senders within hours.
+ANSWER_CACHE_SIZE = 256
+ANSWER_CACHE_TTL  = 6 * 3600
+_ANSWER_CACHE = OrderedDict()  # (query, topic, council) -> (answer, expiry)
+_ANSWER_LOCK = threading.Lock()
+
+def _retrieve_cached(query: str, topic: str, council: str):
+    key, now = (query, topic, council), time.monotonic()
+    with _ANSWER_LOCK:
+        hit = _ANSWER_CACHE.get(key)
+        if hit and hit[1] > now:
+            _ANSWER_CACHE.move_to_end(key)
+            return hit[0]
+    generated = retrieve_answer(query=query, topic=topic, council=council, format="body")
+    with _ANSWER_LOCK:
+        _ANSWER_CACHE[key] = (generated, now + ANSWER_CACHE_TTL)
+        _ANSWER_CACHE.move_to_end(key)
+        while len(_ANSWER_CACHE) > ANSWER_CACHE_SIZE:
+            _ANSWER_CACHE.popitem(last=False)
+    return generated
+
 # ====== GRAPH HELPERS ======
-def list_unread_messages(token: str):
+_TAG_RE = re.compile("<[^<]+?>")
+_WS_RE  = re.compile(r"\s+")
+
+# selectolax (Lexbor, already used by ingest/build_catalog) parses the body in one C pass and drops the
+# same non-content nodes ingest does; without it, fall back to the tag-stripping regex plus entity decoding.
+try:
+    from selectolax.parser import HTMLParser
+except Exception:
+    HTMLParser = None
+_DROP_SEL = "script,style,noscript,svg"
+
+def _html_to_text(body_html: str) -> str:
+    if not body_html:
+        return ""
+    if HTMLParser is not None:
+        tree = HTMLParser(body_html)
+        for node in tree.css(_DROP_SEL):
+            node.decompose()
+        root = tree.body or tree.root
+        return " ".join((root.text(separator=" ") if root is not None else "").split())
+    return _WS_RE.sub(" ", _html_unescape(_TAG_RE.sub(" ", body_html))).strip()
+
+UNREAD_PAGE_SIZE    = 100
+UNREAD_MAX_PER_POLL = 500  # a large backlog drains over several polls without starving replies
+
+def iter_unread_pages(token: str):
+    """Yield pages of unread Inbox messages (newest first), up to UNREAD_MAX_PER_POLL in total.
+    Pages are keyed on receivedDateTime rather than @odata.nextLink: the nextLink is a $skip offset, and
+    replies sent from earlier pages mark messages read (and new mail arrives) while later pages are pending,
+    which would shift the offset past unread mail. Each page asks for messages no newer than the oldest one
+    already seen, so ties at that timestamp repeat and are dropped here; no id is yielded twice."""
     url = f"{GRAPH_BASE}/users/{MAILBOX_ADDRESS}/mailFolders/Inbox/messages"
     params = {
         "$filter": "isRead eq false",
         "$select": "id,subject,from,receivedDateTime,hasAttachments,conversationId,internetMessageId",
-        "$top": "15",
+        "$top": str(UNREAD_PAGE_SIZE),
         "$orderby": "receivedDateTime desc",
     }
-    r = session.get(url, headers=graph_headers(token), params=params, timeout=20)
-    r.raise_for_status()
-    return r.json().get("value", [])
+    yielded = set()
+    while len(yielded) < UNREAD_MAX_PER_POLL:
+        r = graph_request("GET", url, headers=graph_headers(token), params=params, timeout=20)
+        r.raise_for_status()
+        value = _json_loads(r.content).get("value", [])
+        page = [m for m in value if m["id"] not in yielded][:UNREAD_MAX_PER_POLL - len(yielded)]
+        if not page:  # empty, or a whole page sharing one timestamp; the rest waits for the next poll
+            return
+        yielded.update(m["id"] for m in page)
+        yield page
+        oldest = value[-1].get("receivedDateTime")
+        if len(value) < UNREAD_PAGE_SIZE or not oldest:
+            return
+        # receivedDateTime leads the filter, as Graph wants for a filter combined with $orderby
+        params = dict(params, **{"$filter": f"receivedDateTime le {oldest} and isRead eq false"})
 
-def get_message_body(token: str, msg_id: str):
-    url = f"{GRAPH_BASE}/users/{MAILBOX_ADDRESS}/messages/{msg_id}"
-    params = {"$select": "id,subject,body,uniqueBody,from"}
-    r = session.get(url, headers=graph_headers(token), params=params, timeout=20)
-    r.raise_for_status()
-    data = r.json()
-    body_html = (data.get("uniqueBody") or {}).get("content") or (data.get("body") or {}).get("content") or ""
-    body_text = re.sub("<[^<]+?>", " ", body_html)
-    body_text = re.sub(r"\s+", " ", body_text).strip()
+def list_unread_messages(token: str):
+    return [m for page in iter_unread_pages(token) for m in page]
+
+_BODY_SELECT = "id,subject,body,uniqueBody,from,internetMessageHeaders"
+GRAPH_BATCH_MAX = 20  # Graph's limit on sub-requests per $batch call
+
+# Ask Graph to convert bodies to plain text server-side; _html_to_text only runs if a body still comes back HTML
+_TEXT_BODY_PREFER = {"Prefer": 'outlook.body-content-type="text"'}
+
+# Past this a body is signatures, marketing markup or pasted threads, not the question; capping it bounds
+# parse time and the per-message copies (text, query, answer-cache key) of a multi-MB mail
+MAX_BODY_CHARS = 65536
+
+def _split_body(data: dict):
+    part = (data.get("uniqueBody") or {}) if (data.get("uniqueBody") or {}).get("content") else (data.get("body") or {})
+    body_html = part.get("content") or ""
+    if len(body_html) > MAX_BODY_CHARS:
+        log(f"Body of {data.get('id')} is {len(body_html)} chars; using the first {MAX_BODY_CHARS}")
+        body_html = body_html[:MAX_BODY_CHARS]
+    if (part.get("contentType") or "").lower() == "text":
+        body_text = " ".join(body_html.split())
+    else:
+        body_text = _html_to_text(body_html)
     return data, body_text, body_html
 
-def add_categories(token: str, msg_id: str, cats):
+def get_message_body(token: str, msg_id: str):
     url = f"{GRAPH_BASE}/users/{MAILBOX_ADDRESS}/messages/{msg_id}"
-    payload = {"categories": cats}
-    session.patch(url, headers=graph_headers(token), data=json.dumps(payload), timeout=20)
+    params = {"$select": _BODY_SELECT}
+    r = graph_request("GET", url, headers={**graph_headers(token), **_TEXT_BODY_PREFER}, params=params, timeout=20)
+    r.raise_for_status()
+    return _split_body(_json_loads(r.content))
 
-def mark_read(token: str, msg_id: str):
-    url = f"{GRAPH_BASE}/users/{MAILBOX_ADDRESS}/messages/{msg_id}"
-    payload = {"isRead": True}
-    session.patch(url, headers=graph_headers(token), data=json.dumps(payload), timeout=20)
+_JSON_HDR = {"Content-Type": "application/json"}
 
-def create_reply_draft(token: str, original_msg_id: str, html_body: str) -> str:
-    url_create = f"{GRAPH_BASE}/users/{MAILBOX_ADDRESS}/messages/{original_msg_id}/createReply"
-    r = session.post(url_create, headers=graph_headers(token), timeout=20)
+def graph_batch(token: str, reqs) -> dict:
+    """POST up to GRAPH_BATCH_MAX sub-requests as one Graph $batch call -> {sub-request id: response}."""
+    r = graph_request("POST", f"{GRAPH_BASE}/$batch", cost=len(reqs),
+                      headers=graph_headers(token), data=_json_dumps({"requests": reqs}), timeout=30)
     r.raise_for_status()
-    draft_id = r.json()["id"]
-    url_update = f"{GRAPH_BASE}/users/{MAILBOX_ADDRESS}/messages/{draft_id}"
-    payload = {"body": {"contentType": "HTML", "content": html_body}}
-    r2 = session.patch(url_update, headers=graph_headers(token), data=json.dumps(payload), timeout=20)
-    r2.raise_for_status()
-    return draft_id
-
-def send_draft(token: str, draft_id: str) -> bool:
-    url_send = f"{GRAPH_BASE}/users/{MAILBOX_ADDRESS}/messages/{draft_id}/send"
-    r = session.post(url_send, headers=graph_headers(token), timeout=20)
+    return {resp.get("id"): resp for resp in _json_loads(r.content).get("responses", [])}
+
+def get_message_bodies(token: str, msg_ids) -> dict:
+    """Fetch many bodies with one Graph $batch call per 20 ids -> {msg_id: get_message_body() result}.
+    Ids whose sub-request failed are left out; callers fall back to get_message_body for those."""
+    out = {}
+    ids = list(msg_ids)
+    for start in range(0, len(ids), GRAPH_BATCH_MAX):
+        chunk = ids[start:start + GRAPH_BATCH_MAX]
+        res = graph_batch(token, [
+            {"id": str(n), "method": "GET", "url": f"/users/{MAILBOX_ADDRESS}/messages/{mid}?$select={_BODY_SELECT}",
+             "headers": _TEXT_BODY_PREFER}
+            for n, mid in enumerate(chunk)
+        ])
+        for n, mid in enumerate(chunk):
+            resp = res.get(str(n)) or {}
+            if resp.get("status") == 200 and isinstance(resp.get("body"), dict):
+                out[mid] = _split_body(resp["body"])
+    return out
+
+def tag_message(token: str, msg_id: str, categories) -> None:
+    url = f"{GRAPH_BASE}/users/{MAILBOX_ADDRESS}/messages/{msg_id}"
+    r = graph_request("PATCH", url, headers=graph_headers(token), data=_json_dumps({"categories": list(categories)}), timeout=20)
     r.raise_for_status()
-    return True
+
+def post_reply(token: str, msg_id: str, html_body: str, send: bool, categories) -> None:
+    """Reply to msg_id with html_body in one $batch round trip.
+    send=True uses the reply action (create, fill and send in one call) and then marks the original read;
+    send=False leaves a createReply draft for review. The original is tagged with categories only after the
+    reply sub-request succeeded (dependsOn); like before, a failed tag is not an error."""
+    path = f"/users/{MAILBOX_ADDRESS}/messages/{msg_id}"
+    action = "reply" if send else "createReply"
+    tag = {"categories": list(categories), "isRead": True} if send else {"categories": list(categories)}
+    res = graph_batch(token, [
+        {"id": "1", "method": "POST", "url": f"{path}/{action}", "headers": _JSON_HDR,
+         "body": {"message": {"body": {"contentType": "HTML", "content": html_body}}}},
+        {"id": "2", "method": "PATCH", "url": path, "headers": _JSON_HDR, "body": tag, "dependsOn": ["1"]},
+    ])
+    status = (res.get("1") or {}).get("status", 0)
+    if not 200 <= status < 300:
+        raise RuntimeError(f"Graph {action} failed: {status} {str((res.get('1') or {}).get('body'))[:250]}")
 
 # ====== EMAIL BUILDER ======
+# The same catalog/curated links recur across emails, so each <li> is formatted once
+@functools.lru_cache(maxsize=1024)
+def _link_item(url: str, title: str) -> str:
+    return f'<li><a href="{url}">{title}</a></li>'
+
+# Static reply chrome (signature included) rendered once; per email only body, links and quote are filled in
+_SIGNATURE_HTML = f"<p>{REPLY_SIGNATURE.replace(chr(10), '<br>')}</p>"
+_EMAIL_TEMPLATE = (
+    '<div style="font-family:system-ui,Segoe UI,Roboto,Helvetica,Arial,sans-serif;font-size:15px;line-height:1.5">\n'
+    "  <p>Hi,</p>\n"
+    "  %s\n"
+    "  %s\n"
+    "  " + _SIGNATURE_HTML.replace("%", "%%") + "\n"
+    "  <hr>\n"
+    '  <p style="color:#777">Original question:</p>\n'
+    '  <blockquote style="margin:0 0 0 1em;color:#555;border-left:3px solid #ddd;padding-left:.8em">%s</blockquote>\n'
+    "</div>"
+)
+
+MAX_QUOTE_CHARS = 4096  # of the original quoted back in the reply; longer mails end in an ellipsis
+
 def build_email_html(user_body_text: str, generated: dict) -> str:
     answer_body_html = generated.get("answer_html", "<p>Thanks for your email.</p>")
     links_html = ""
     if generated.get("links"):
-        items = "".join(f'<li><a href="{l["url"]}">{l["title"]}</a></li>' for l in generated["links"][:6])
+        items = "".join(_link_item(l["url"], l["title"]) for l in generated["links"][:6])
         links_html = f"<p><strong>Official links:</strong></p><ul>{items}</ul>"
-    signature_html = f"<p>{REPLY_SIGNATURE.replace(chr(10), '<br>')}</p>"
-    quote_text = re.sub(r"\s+", " ", user_body_text or "").strip()
+    quote_text = user_body_text or ""  # get_message_body already collapsed whitespace and stripped it
+    if len(quote_text) > MAX_QUOTE_CHARS:
+        quote_text = quote_text[:MAX_QUOTE_CHARS] + " …"
     quote_html = (quote_text.replace("&","&amp;").replace("<","&lt;").replace(">","&gt;"))
-    return f"""
-<div style="font-family:system-ui,Segoe UI,Roboto,Helvetica,Arial,sans-serif;font-size:15px;line-height:1.5">
-  <p>Hi,</p>
-  {answer_body_html}
-  {links_html}
-  {signature_html}
-  <hr>
-  <p style="color:#777">Original question:</p>
-  <blockquote style="margin:0 0 0 1em;color:#555;border-left:3px solid #ddd;padding-left:.8em">{quote_html}</blockquote>
-</div>
-    """.strip()
+    return _EMAIL_TEMPLATE % (answer_body_html, links_html, quote_html)
 
 # ====== PROCESS ONE ======
-def process_message(token: str, m: dict):
+def process_message(token: str, m: dict, prefetched=None):
     msg_id = m["id"]
-    if msg_id in processed_ids:
+    if not begin_processing(msg_id):
         return
     try:
-        data, body_text, _ = get_message_body(token, msg_id)
+        # Loop safety: the listing already has subject/sender, so obvious cases never fetch the body;
+        # the full message adds the autoresponder headers
+        skip = loop_guard(m)
+        if not skip:
+            data, body_text, _ = prefetched or get_message_body(token, msg_id)
+            skip = loop_guard(data)
+        if skip:
+            mark_processed(msg_id); log(skip); return
         subject = (data.get("subject") or "").strip()
-        sender  = ((data.get("from") or {}).get("emailAddress") or {}).get("address", "").strip()
-
-        # Loop safety
-        if sender and MAILBOX_ADDRESS and sender.lower() == MAILBOX_ADDRESS.lower():
-            processed_ids.add(msg_id); save_state(processed_ids); log(f"Skip self {msg_id}"); return
-        if looks_like_auto_reply(subject):
-            processed_ids.add(msg_id); save_state(processed_ids); log(f"Skip auto-reply {msg_id}: {subject!r}"); return
-        if SKIP_NOREPLY and looks_like_noreply(sender):
-            processed_ids.add(msg_id); save_state(processed_ids); log(f"Skip no-reply sender {sender}"); return
+        sender  = _sender_address(data)
 
-        topic, topic_is_green = classify_topic(f"{subject}\n{body_text}")
-        risk, reasons = classify_risk(f"{subject}\n{body_text}")
+        text = f"{subject}\n{body_text}"
+        topic, topic_is_green = classify_topic(text[:TOPIC_SCAN_CHARS])
+        risk, reasons = classify_risk(text)
 
         # === AUTOSEND DECISION ===
         # If AUTO_SEND_ALL -> send no matter what (still respecting loop guards above).
@@ -262,53 +653,94 @@ def process_message(token: str, m: dict):
 
         log(f"Processing {msg_id}: topic={topic}, risk={risk}, autosend={'YES' if can_autosend else 'NO'}; sender={sender}")
 
-        generated = retrieve_answer(
-            query=f"Subject: {subject}\n\nBody: {body_text}",
-            topic=topic,
-            council=COUNCIL_NAME,
-            format="body",
-        )
+        # A generic info reply is no help to whoever handles a RED case; skip retrieval (and any LLM call)
+        if risk == "RED" and not can_autosend and not DRAFT_RED:
+            tag_message(token, msg_id, [CATEGORY_NEEDSREV])
+            mark_processed(msg_id)
+            log(f"✳️ Tagged for review without draft (RED: message {msg_id})")
+            return
+
+        generated = _retrieve_cached(f"Subject: {subject}\n\nBody: {body_text}", topic, COUNCIL_NAME)
         html = build_email_html(body_text, generated)
-        draft_id = create_reply_draft(token, msg_id, html)
 
         if can_autosend:
-            send_draft(token, draft_id)
-            try: add_categories(token, msg_id, [CATEGORY_REPLIED])
-            except Exception: pass
-            mark_read(token, msg_id)
+            post_reply(token, msg_id, html, send=True, categories=[CATEGORY_REPLIED])
             log(f"✅ Auto-sent reply to message {msg_id}")
         else:
-            try: add_categories(token, msg_id, [CATEGORY_NEEDSREV])
-            except Exception: pass
+            post_reply(token, msg_id, html, send=False, categories=[CATEGORY_NEEDSREV])
             log(f"✳️ Draft created for review (message {msg_id})")
 
-        processed_ids.add(msg_id); save_state(processed_ids)
+        mark_processed(msg_id)
 
     except requests.HTTPError as he:
+        release_claim(msg_id)
+        if he.response.status_code == 401: invalidate_token()  # message stays unprocessed; retried next poll
         log(f"HTTP error processing {msg_id}: {he.response.status_code} {he.response.text[:250]}")
     except Exception as e:
-        log(f"❌ Error processing {msg_id}: {e}"); traceback.print_exc()
+        release_claim(msg_id)
+        logger.exception(f"❌ Error processing {msg_id}: {e}")
+    finally:
+        end_processing(msg_id)
 
 # ====== MAIN LOOP ======
+def setup_logging():
+    # Worker and library loggers (e.g. retriever_catalog) enqueue records; a background listener does the
+    # stderr I/O, so a burst of messages never blocks processing threads on the stream lock.
+    q = queue.SimpleQueue()
+    handler = logging.StreamHandler()
+    formatter = logging.Formatter("[%(asctime)sZ] %(name)s %(levelname)s: %(message)s")
+    formatter.converter = time.gmtime  # UTC, as the worker's log lines always were
+    handler.setFormatter(formatter)
+    listener = logging.handlers.QueueListener(q, handler)
+    enqueue = logging.handlers.QueueHandler(q)
+    enqueue.setFormatter(logging.Formatter("%(message)s"))  # else basicConfig's default format is applied twice
+    logging.basicConfig(level=logging.INFO, handlers=[enqueue], force=True)
+    listener.start()
+    return listener
+
 def main():
+    setup_logging()
     if not all([TENANT_ID, CLIENT_ID, CLIENT_SECRET, MAILBOX_ADDRESS]):
         raise RuntimeError("Missing env: GRAPH_TENANT_ID, GRAPH_CLIENT_ID, GRAPH_CLIENT_SECRET, GRAPH_MAILBOX_ADDRESS")
     log(f"Worker started. Poll {POLL_SECONDS}s. AUTO_SEND_ALL={AUTO_SEND_ALL}. GREEN_TOPICS={GREEN_TOPICS}. COUNCIL={COUNCIL_NAME}")
     token = get_token()
+    delay = POLL_SECONDS
+    pool = ThreadPoolExecutor(max_workers=WORKER_THREADS, thread_name_prefix="msg")
     while True:
+        jobs, submitted = [], set()  # an id can show up on two pages when new mail shifts the listing
         try:
             token = get_token()
-            msgs = list_unread_messages(token)
-            if not msgs:
+            listed = claimed = 0
+            # Each page is claimed, batch-fetched and queued on the pool before the next one is requested,
+            # so listing a backlog overlaps with answering it
+            for msgs in iter_unread_pages(token):
+                msgs = [m for m in msgs if m["id"] not in submitted]
+                submitted.update(m["id"] for m in msgs)
+                listed += len(msgs)
+                new = [m["id"] for m in msgs if m["id"] not in processed_ids and not loop_guard(m)]
+                fresh = claim_messages(new)
+                claimed += len(fresh)
+                others = set(new).difference(fresh)  # claimed by another replica
+                try:
+                    bodies = get_message_bodies(token, fresh) if fresh else {}
+                except Exception as e:
+                    log(f"Batch fetch failed, fetching one by one: {e}"); bodies = {}
+                jobs += [pool.submit(process_message, token, m, bodies.get(m["id"])) for m in msgs if m["id"] not in others]
+            if not listed:
                 log("No unread messages.")
-            else:
-                for m in msgs:
-                    process_message(token, m)
+            # Review drafts leave their messages unread, so "idle" means nothing new rather than an empty Inbox
+            delay = POLL_SECONDS if claimed else min(delay * 2, POLL_MAX_SECONDS)
         except requests.HTTPError as he:
+            if he.response.status_code == 401: invalidate_token()
             log(f"HTTP error: {he.response.status_code} {he.response.text[:250]}")
         except Exception as e:
-            log(f"Unexpected error: {e}"); traceback.print_exc()
-        time.sleep(POLL_SECONDS)
+            logger.exception(f"Unexpected error: {e}")
+        finally:
+            # Always let queued messages finish (process_message handles its own errors) so the next poll
+            # can't pick up a message that is still being answered
+            for job in jobs:
+                job.result()
+        time.sleep(delay)
 
 if __name__ == "__main__":
     main()